@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import click
@@ -244,7 +246,7 @@ def run(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -372,7 +374,7 @@ def predict(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -487,7 +489,7 @@ def compare(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -593,7 +595,7 @@ def proteins_predict(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -726,7 +728,7 @@ def proteins_compare(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -855,7 +857,7 @@ def remote(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -889,7 +891,7 @@ def remote(
     # Create a nested dictionary to store CDS features by contig ID
     cds_dict = {}
 
-    fasta_aa: Path = Path(output) / f"{prefix}_aa.fasta"
+    fasta_aa: Path = output / f"{prefix}_aa.fasta"
 
     # makes the nested dictionary {contig_id:{cds_id: cds_feature}}
     if fasta_flag is False:
@@ -903,21 +905,22 @@ def remote(
         cds_dict = gb_dict
 
     ## write the CDS to file
-
+    # build the entries up front and write the joined buffer once, rather
+    # than issuing two writes per CDS
     with open(fasta_aa, "w+") as out_f:
-        for contig_id, rest in cds_dict.items():
-            aa_contig_dict = cds_dict[contig_id]
-
-            # writes the CDS to file
-            for seq_id, cds_feature in aa_contig_dict.items():
-                out_f.write(f">{contig_id}:{seq_id}\n")
-                out_f.write(f"{cds_feature.qualifiers['translation'][0]}\n")
+        out_f.write(
+            "".join(
+                f">{contig_id}:{seq_id}\n{cds_feature.qualifiers['translation'][0]}\n"
+                for contig_id, aa_contig_dict in cds_dict.items()
+                for seq_id, cds_feature in aa_contig_dict.items()
+            )
+        )
 
     ############
     # prostt5 remote
     ############
 
-    fasta_3di: Path = Path(output) / f"{prefix}_3di.fasta"
+    fasta_3di: Path = output / f"{prefix}_3di.fasta"
     query_remote_3di(cds_dict, fasta_3di)
 
     ############
@@ -1022,7 +1025,7 @@ def createdb(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--fasta_aa": fasta_aa,
@@ -1048,7 +1051,7 @@ def createdb(
     # create foldseek db
     ############
 
-    foldseek_query_db_path: Path = Path(output)
+    foldseek_query_db_path: Path = output
     foldseek_query_db_path.mkdir(parents=True, exist_ok=True)
 
     generate_foldseek_db_from_aa_3di(
@@ -1230,7 +1233,7 @@ def plot(
     instantiate_dirs(output, force)
 
     output: Path = Path(output)
-    logdir: Path = Path(output) / "logs"
+    logdir: Path = output / "logs"
 
     params = {
         "--input": input,
@@ -1289,19 +1292,20 @@ def plot(
         logger.info(
             f"You have specified a file {label_ids} containing a list of CDS IDs to force label."
         )
+        label_ids_path = Path(label_ids)
         # check if it is a file
-        if Path(label_ids).exists() is False:
+        if label_ids_path.exists() is False:
             logger.error(f"{label_ids} was not found.")
         # check if it contains text
         try:
             # Open the file in read mode
-            with open(Path(label_ids), "r") as file:
+            with open(label_ids_path, "r") as file:
                 # Read the first character
                 # will error if file is empty
                 first_char = file.read(1)
 
                 # read all the labels
-                with open(Path(label_ids)) as f:
+                with open(label_ids_path) as f:
                     ignore_dict = {x.rstrip().split()[0] for x in f}
                 # label force list
                 label_force_list = list(ignore_dict)
@@ -1311,10 +1315,8 @@ def plot(
 
     # if there is 1 contig, then all the parameters will apply
 
-    for contig_id, contig_sequence in gb_seq_dict.items():
-        logger.info(f"Plotting {contig_id}")
-
-        create_circos_plot(
+    def plot_args(contig_id, contig_sequence):
+        return (
             contig_id,
             contig_sequence,
             contig_count,
@@ -1334,6 +1336,36 @@ def plot(
             label_force_list,
         )
 
+    # each contig plot is independent and savefig is CPU-bound, so plot
+    # multi-contig inputs across a process pool (matplotlib is not
+    # thread-safe, but the Agg backend is fork-safe)
+    plotted = False
+    if contig_count > 1:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, contig_count)
+            ) as executor:
+                futures = []
+                for contig_id, contig_sequence in gb_seq_dict.items():
+                    logger.info(f"Plotting {contig_id}")
+                    futures.append(
+                        executor.submit(
+                            create_circos_plot, *plot_args(contig_id, contig_sequence)
+                        )
+                    )
+                for future in futures:
+                    future.result()
+            plotted = True
+        except Exception:
+            logger.warning(
+                "Parallel plotting failed. Falling back to plotting each contig serially"
+            )
+
+    if plotted is False:
+        for contig_id, contig_sequence in gb_seq_dict.items():
+            logger.info(f"Plotting {contig_id}")
+            create_circos_plot(*plot_args(contig_id, contig_sequence))
+
 
 @click.command()
 def citation(**kwargs):
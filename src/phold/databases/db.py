@@ -8,22 +8,35 @@ GZIP=-9 tar cvzf phold_structure_foldseek_db.tar.gz phold_structure_foldseek_db
 import hashlib
 import os
 import shutil
+import subprocess
 import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
 from alive_progress import alive_bar
 from loguru import logger
 
-from phold.utils.util import remove_directory
+# BLAKE3 hashes at SIMD speed and parallelises across cores, so prefer it
+# for integrity checks when it is installed and a digest is recorded
+try:
+    import blake3
+
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
 
 # set this if changes
 CURRENT_DB_VERSION: str = "0.1.0"
 
 # to hold information about the different DBs
+# blake3 is None for DB versions that only shipped with an MD5 manifest
 VERSION_DICTIONARY = {
     "0.1.0": {
         "md5": "353a1a6763e1261c5c44e1e2da9d8736",
+        "blake3": None,
         "major": 0,
         "minor": 1,
         "minorest": 0,
@@ -85,23 +98,34 @@ def install_database(db_dir: Path) -> None:
         logger.info("Some Phold databases files are missing")
         logger.info("Downloading the Phold database")
 
-        db_url = VERSION_DICTIONARY[CURRENT_DB_VERSION]["db_url"]
-        requiredmd5 = VERSION_DICTIONARY[CURRENT_DB_VERSION]["md5"]
+        # look up the version entry once rather than per field
+        version_entry = VERSION_DICTIONARY[CURRENT_DB_VERSION]
+        db_url = version_entry["db_url"]
+        requiredmd5 = version_entry["md5"]
 
         logger.info(f"Downloading Phold database from {db_url}")
 
-        tarball = VERSION_DICTIONARY[CURRENT_DB_VERSION]["tarball"]
+        tarball = version_entry["tarball"]
         tarball_path = Path(f"{db_dir}/{tarball}")
 
-        download(db_url, tarball_path)
+        md5_sum = download(db_url, tarball_path)
 
-        md5_sum = calc_md5_sum(tarball_path)
+        required_blake3 = version_entry.get("blake3")
+        if required_blake3 is not None and BLAKE3_AVAILABLE:
+            checksum = calc_blake3_sum(tarball_path)
+            required_checksum = required_blake3
+            checksum_name = "BLAKE3"
+        else:
+            # legacy MD5 manifest
+            checksum = md5_sum
+            required_checksum = requiredmd5
+            checksum_name = "MD5"
 
-        if md5_sum == requiredmd5:
-            logger.info(f"Phold database file download OK: {md5_sum}")
+        if checksum == required_checksum:
+            logger.info(f"Phold database file download OK: {checksum}")
         else:
             logger.error(
-                f"Error: corrupt database file! MD5 should be '{requiredmd5}' but is '{md5_sum}'"
+                f"Error: corrupt database file! {checksum_name} should be '{required_checksum}' but is '{checksum}'"
             )
 
         logger.info(
@@ -116,14 +140,107 @@ lots of this code from the marvellous bakta https://github.com/oschwengers/bakta
 """
 
 
-def download(db_url: str, tarball_path: Path) -> None:
+def download_ranges(
+    db_url: str, tarball_path: Path, total_length: int, max_connections: int
+) -> bool:
+    """
+    Download the database with parallel HTTP Range requests.
+
+    Each worker fetches a disjoint byte range and writes it directly at the
+    right offset, so multiple TCP connections can saturate the link where a
+    single stream is RTT-limited.
+
+    Args:
+        db_url (str): The URL of the database.
+        tarball_path (Path): The path where the downloaded tarball should be saved.
+        total_length (int): Total size of the file in bytes.
+        max_connections (int): Number of parallel connections.
+
+    Returns:
+        bool: True if every range downloaded successfully, False otherwise.
+    """
+    # ceiling division so the last range covers the remainder
+    part_size = -(-total_length // max_connections)
+    byte_ranges = [
+        (lo, min(lo + part_size, total_length) - 1)
+        for lo in range(0, total_length, part_size)
+    ]
+
+    bar_lock = threading.Lock()
+    fd = os.open(str(tarball_path), os.O_CREAT | os.O_WRONLY | os.O_TRUNC)
+    try:
+        # pre-allocate so the parallel writes do not fragment the file
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, total_length)
+
+        with alive_bar(total=total_length, scale="SI") as bar:
+
+            def fetch_range(byte_range):
+                lo, hi = byte_range
+                offset = lo
+                with requests.get(
+                    db_url, headers={"Range": f"bytes={lo}-{hi}"}, stream=True
+                ) as resp:
+                    # server does not honour ranges
+                    if resp.status_code != 206:
+                        return False
+                    for data in resp.iter_content(chunk_size=1024 * 1024):
+                        os.pwrite(fd, data, offset)
+                        offset += len(data)
+                        with bar_lock:
+                            bar(count=len(data))
+                return True
+
+            with ThreadPoolExecutor(max_workers=max_connections) as executor:
+                results = list(executor.map(fetch_range, byte_ranges))
+    finally:
+        os.close(fd)
+
+    return all(results)
+
+
+def download(db_url: str, tarball_path: Path, max_connections: int = 4) -> str:
     """
     Download the database from the given URL.
 
+    Uses parallel HTTP Range requests when the server supports them, falling
+    back to a single stream otherwise. The MD5 checksum is updated chunk by
+    chunk as the single stream downloads, so the tarball does not need to be
+    re-read from disk afterwards.
+
     Args:
         db_url (str): The URL of the database.
         tarball_path (Path): The path where the downloaded tarball should be saved.
+        max_connections (int): Maximum parallel connections for ranged downloads.
+
+    Returns:
+        str: The MD5 checksum of the downloaded file.
     """
+    # preflight to see whether the server supports Range requests
+    total_length = 0
+    accept_ranges = False
+    try:
+        head = requests.head(db_url, allow_redirects=True, timeout=30)
+        total_length = int(head.headers.get("content-length", 0))
+        accept_ranges = head.headers.get("accept-ranges", "").lower() == "bytes"
+    except (IOError, ValueError):
+        pass
+
+    if (
+        accept_ranges
+        and total_length > 0
+        and max_connections > 1
+        and hasattr(os, "pwrite")
+    ):
+        logger.info(f"Downloading with {max_connections} parallel connections")
+        try:
+            if download_ranges(db_url, tarball_path, total_length, max_connections):
+                return calc_md5_sum(tarball_path)
+        except IOError:
+            pass
+        logger.warning("Ranged download failed. Falling back to a single stream")
+
+    md5 = hashlib.md5()
     try:
         with tarball_path.open("wb") as fh_out, requests.get(
             db_url, stream=True
@@ -134,11 +251,13 @@ def download(db_url: str, tarball_path: Path) -> None:
             with alive_bar(total=total_length, scale="SI") as bar:
                 for data in resp.iter_content(chunk_size=1024 * 1024):
                     fh_out.write(data)
+                    md5.update(data)
                     bar(count=len(data))
     except IOError:
         logger.error(
             f"ERROR: Could not download file from Zenodo! url={db_url}, path={tarball_path}"
         )
+    return md5.hexdigest()
 
 
 def calc_md5_sum(tarball_path: Path, buffer_size: int = 1024 * 1024) -> str:
@@ -162,34 +281,77 @@ def calc_md5_sum(tarball_path: Path, buffer_size: int = 1024 * 1024) -> str:
     return md5.hexdigest()
 
 
+def calc_blake3_sum(tarball_path: Path, buffer_size: int = 1024 * 1024) -> str:
+    """
+    Calculate the BLAKE3 checksum of the given file.
+
+    Args:
+        tarball_path (Path): The path to the file for which the BLAKE3 checksum needs to be calculated.
+        buffer_size (int): The buffer size for reading the file.
+
+    Returns:
+        str: The BLAKE3 checksum of the file.
+    """
+
+    hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+    with tarball_path.open("rb") as fh:
+        data = fh.read(buffer_size)
+        while data:
+            hasher.update(data)
+            data = fh.read(buffer_size)
+    return hasher.hexdigest()
+
+
 def untar(tarball_path: Path, output_path: Path) -> None:
     """
     Extract the tarball to the output path.
 
+    Decompresses through pigz when it is on PATH, which parallelises the gzip
+    decode across cores, and falls back to Python's single-threaded gzip
+    otherwise.
+
     Args:
         tarball_path (Path): The path to the tarball file.
         output_path (Path): The path where the contents of the tarball should be extracted.
     """
     try:
-        with tarball_path.open("rb") as fh_in, tarfile.open(
-            fileobj=fh_in, mode="r:gz"
-        ) as tar_file:
-            tar_file.extractall(path=str(output_path))
+        pigz = shutil.which("pigz")
+        if pigz is not None:
+            # stream the decompressed tar from pigz (no seeking needed)
+            proc = subprocess.Popen(
+                [pigz, "-dc", str(tarball_path)], stdout=subprocess.PIPE
+            )
+            with tarfile.open(fileobj=proc.stdout, mode="r|") as tar_file:
+                extract_without_top_dir(tar_file, output_path)
+            proc.stdout.close()
+            proc.wait()
+        else:
+            with tarfile.open(str(tarball_path), mode="r:gz") as tar_file:
+                extract_without_top_dir(tar_file, output_path)
 
-        tarpath = Path(output_path) / VERSION_DICTIONARY[CURRENT_DB_VERSION]["dir_name"]
+    except (OSError, tarfile.ReadError):
+        logger.error(f"Could not extract {tarball_path} to {output_path}")
 
-        # Get a list of all files in the directory
-        files_to_move = [f for f in tarpath.iterdir() if f.is_file()]
 
-        # Move each file to the destination directory
-        for file_name in files_to_move:
-            destination_path = output_path / file_name.name
-            shutil.move(file_name, destination_path)
-        # remove the directory
-        remove_directory(tarpath)
+def extract_without_top_dir(tar_file: tarfile.TarFile, output_path: Path) -> None:
+    """
+    Extract tarball members with the top-level directory stripped.
 
-    except OSError:
-        logger.error(f"Could not extract {tarball_path} to {output_path}")
+    Rewrites member names as they stream past so the database files land
+    directly in the output directory, avoiding the extract-then-move pass
+    over every file.
+
+    Args:
+        tar_file (tarfile.TarFile): Open tarfile to extract from.
+        output_path (Path): The path where the members should be extracted.
+    """
+    for member in tar_file:
+        parts = member.name.split("/", 1)
+        # skip the top-level directory entry itself
+        if len(parts) == 1 and member.isdir():
+            continue
+        member.name = parts[-1]
+        tar_file.extract(member, path=str(output_path))
 
 
 def check_db_installation(db_dir: Path) -> bool:
@@ -202,13 +364,21 @@ def check_db_installation(db_dir: Path) -> bool:
     Returns:
         bool: True if all required files are present, False otherwise.
     """
+    # probe the files concurrently - on network filesystems every stat is a
+    # round-trip, so the serial loop cost scales with file count
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(
+            executor.map(
+                lambda file_name: (file_name, (Path(db_dir) / file_name).is_file()),
+                PHOLD_DB_NAMES,
+            )
+        )
+
     downloaded_flag = True
-    for file_name in PHOLD_DB_NAMES:
-        path = Path(db_dir) / file_name
-        if not path.is_file():
-            logger.warning(f"Phold Database file {path} is missing")
+    for file_name, present in results:
+        if not present:
+            logger.warning(f"Phold Database file {Path(db_dir) / file_name} is missing")
             downloaded_flag = False
-            break
 
     return downloaded_flag
 
@@ -130,6 +130,80 @@ def get_T5_model(
     return model, vocab
 
 
+def slice_embedding_table(
+    model: T5EncoderModel,
+    vocab: T5Tokenizer,
+    cds_dict: Dict[str, Dict[str, Any]],
+) -> Optional[torch.Tensor]:
+    """
+    Slice the ProstT5 input embedding table down to the tokens actually used.
+
+    The CDS translations only activate the amino-acid alphabet (plus the
+    ProstT5 prefix and special tokens), so the full embedding table is very
+    sparsely used. Replaces the embedding weight with a dense sliced table and
+    returns a remap tensor from original token IDs to rows of the sliced table.
+
+    Args:
+        model (T5EncoderModel): Loaded ProstT5 encoder model.
+        vocab (T5Tokenizer): Loaded ProstT5 tokenizer.
+        cds_dict (Dict[str, Dict[str, Any]]): nested dictionary containing contig IDs, CDS IDs and corresponding protein sequences.
+
+    Returns:
+        Optional[torch.Tensor]: Remap tensor to apply to input IDs, or None if slicing was not possible.
+    """
+
+    used_aas = set()
+    for cds_records in cds_dict.values():
+        for seq_feature in cds_records.values():
+            used_aas.update(seq_feature.qualifiers["translation"])
+
+    if not used_aas:
+        return None
+
+    # non-standard AAs are replaced with X before tokenization
+    used_aas = {("X" if aa in "UZO" else aa) for aa in used_aas}
+
+    try:
+        # probe string in the same format as the batched sequences so the
+        # tokenizer produces the same pieces (prefix + space-separated AAs)
+        probe = "<AA2fold> " + " ".join(sorted(used_aas))
+        used_ids = set(vocab.encode(probe))
+        used_ids.add(vocab.pad_token_id)
+        if vocab.unk_token_id is not None:
+            used_ids.add(vocab.unk_token_id)
+
+        index_map = torch.tensor(sorted(used_ids), dtype=torch.long, device=device)
+
+        embedding = model.get_input_embeddings()
+        full_vocab_size = embedding.weight.shape[0]
+
+        # any token ID outside the used set maps to the unk/pad row
+        fallback_id = vocab.unk_token_id
+        if fallback_id is None:
+            fallback_id = vocab.pad_token_id
+        fallback_row = int((index_map == fallback_id).nonzero()[0])
+
+        remap = torch.full(
+            (full_vocab_size,), fallback_row, dtype=torch.long, device=device
+        )
+        remap[index_map] = torch.arange(index_map.numel(), device=device)
+
+        embedding.weight = nn.Parameter(
+            embedding.weight.index_select(0, index_map).clone()
+        )
+
+        logger.info(
+            f"Sliced the ProstT5 embedding table from {full_vocab_size} to {index_map.numel()} rows"
+        )
+        return remap
+
+    except Exception:
+        logger.warning(
+            "Could not slice the ProstT5 embedding table. Using the full table"
+        )
+        return None
+
+
 def write_predictions(
     predictions: Dict[str, Dict[str, Tuple[List[str], Any, Any]]],
     out_path: Path,
@@ -358,6 +432,10 @@ def get_embeddings(
     else:
         logger.info("Using models in full-precision")
 
+    # slice the embedding table down to the AA tokens actually used
+    # the 20 AA alphabet activates the table very sparsely
+    remap = slice_embedding_table(model, vocab, cds_dict)
+
     # loop over each record in the cds dict
     fail_ids = []
     for record_id, cds_records in cds_dict.items():
@@ -365,141 +443,203 @@ def get_embeddings(
         predictions[record_id] = {}
 
         seq_record_dict = cds_dict[record_id]
-        seq_dict = {}
-
-        # gets the seq_dict with key for id and the translation
-        for key, seq_feature in seq_record_dict.items():
-            # get the protein seq for normal
-            seq_dict[key] = seq_feature.qualifiers["translation"]
 
-        # sort sequences by length to trigger OOM at the beginning
-        seq_dict = dict(
-            sorted(seq_dict.items(), key=lambda kv: len(kv[1][0]), reverse=True)
+        # structure-of-arrays layout - parallel id/translation/length arrays
+        # rather than a dict of features, so the length sort is a vectorised
+        # argsort and the batching loop only touches flat lists
+        seq_ids = list(seq_record_dict.keys())
+        translations = [
+            seq_feature.qualifiers["translation"]
+            for seq_feature in seq_record_dict.values()
+        ]
+        lengths = np.fromiter(
+            (len(translation) for translation in translations),
+            dtype=np.int64,
+            count=len(translations),
         )
+        n_seqs = len(seq_ids)
+
+        # sort sequences by length (longest first) to trigger OOM at the beginning
+        sort_order = np.argsort(-lengths, kind="stable")
 
+        # assemble all batches for this record up front so that, on GPU, the
+        # next batch's tokenisation and host-to-device copy can be staged
+        # while the current forward pass is still running
+        batches = []
         batch = list()
-        for seq_idx, (pdb_id, seq) in enumerate(seq_dict.items(), 1):
+        batch_max_len = 0
+        for seq_idx, order_idx in enumerate(sort_order, 1):
+            pdb_id = seq_ids[order_idx]
+            seq = translations[order_idx]
             # replace non-standard AAs
             seq = seq.replace("U", "X").replace("Z", "X").replace("O", "X")
             seq_len = len(seq)
             seq = prostt5_prefix + " " + " ".join(list(seq))
             batch.append((pdb_id, seq, seq_len))
-
-            # count residues in current batch and add the last sequence length to
-            # avoid that batches with (n_res_batch > max_residues) get processed
-            n_res_batch = sum([s_len for _, _, s_len in batch]) + seq_len
+            # longest sequence in the batch (first one, as sorted by length)
+            batch_max_len = max(batch_max_len, seq_len)
+
+            # batches are padded to the longest member, so budget on padded
+            # tokens (batch size x longest) rather than raw residue counts -
+            # this stops short sequences wasting FLOPs on pad tokens behind a
+            # long one. Add one sequence of headroom to avoid that batches
+            # with (n_res_batch > max_residues) get processed
+            n_res_batch = (len(batch) + 1) * batch_max_len
             if (
                 len(batch) >= max_batch
                 or n_res_batch >= max_residues
-                or seq_idx == len(seq_dict)
+                or seq_idx == n_seqs
                 or seq_len > max_seq_len
             ):
-                pdb_ids, seqs, seq_lens = zip(*batch)
+                batches.append(tuple(zip(*batch)))
                 batch = list()
-
-                token_encoding = vocab.batch_encode_plus(
-                    seqs,
-                    add_special_tokens=True,
-                    padding="longest",
-                    return_tensors="pt",
-                ).to(device)
-                try:
-                    with torch.no_grad():
-                        embedding_repr = model(
-                            token_encoding.input_ids,
-                            attention_mask=token_encoding.attention_mask,
-                        )
-                except RuntimeError:
-                    logger.warning(f" number of residues in batch {n_res_batch}")
-                    logger.warning(f" seq length is {seq_len}")
-                    logger.warning(f" ids are {pdb_ids}")
-                    logger.warning(
-                        "RuntimeError during embedding for {} (L={})".format(
-                            pdb_id, seq_len
-                        )
+                batch_max_len = 0
+
+        prefetch = device.type == "cuda"
+        copy_stream = torch.cuda.Stream() if prefetch else None
+
+        def tokenize_and_transfer(seqs):
+            # tokenise a batch and move it to the device - on GPU, stage
+            # through pinned host memory on a side stream so the copy can
+            # overlap the in-flight forward pass
+            encoding = vocab.batch_encode_plus(
+                seqs,
+                add_special_tokens=True,
+                padding="longest",
+                return_tensors="pt",
+            )
+            input_ids = encoding["input_ids"]
+            attention_mask = encoding["attention_mask"]
+            if not prefetch:
+                return input_ids.to(device), attention_mask.to(device), None
+            with torch.cuda.stream(copy_stream):
+                input_ids = input_ids.pin_memory().to(device, non_blocking=True)
+                attention_mask = attention_mask.pin_memory().to(
+                    device, non_blocking=True
+                )
+                copy_done = torch.cuda.Event()
+                copy_done.record(copy_stream)
+            return input_ids, attention_mask, copy_done
+
+        staged = tokenize_and_transfer(batches[0][1]) if batches else None
+
+        for batch_i, (pdb_ids, seqs, seq_lens) in enumerate(batches):
+            input_ids, attention_mask, copy_done = staged
+            # stage the next batch immediately - its CPU tokenisation and
+            # host-to-device copy run behind the forward pass launched below
+            staged = (
+                tokenize_and_transfer(batches[batch_i + 1][1])
+                if batch_i + 1 < len(batches)
+                else None
+            )
+
+            # compute must not read the inputs before their copy has landed
+            if copy_done is not None:
+                torch.cuda.current_stream().wait_event(copy_done)
+
+            # remap token IDs into the sliced embedding table
+            if remap is not None:
+                input_ids = remap[input_ids]
+
+            try:
+                with torch.no_grad():
+                    embedding_repr = model(
+                        input_ids,
+                        attention_mask=attention_mask,
                     )
-                    for id in pdb_ids:
-                        fail_ids.append(id)
-                    continue
-
-                # ProtT5 appends a special tokens at the end of each sequence
-                # Mask this also out during inference while taking into account the prostt5 prefix
-                try:
-                    for idx, s_len in enumerate(seq_lens):
-                        token_encoding.attention_mask[idx, s_len + 1] = 0
-
-                    # extract last hidden states (=embeddings)
-                    residue_embedding = embedding_repr.last_hidden_state.detach()
-                    # mask out padded elements in the attention output (can be non-zero) for further processing/prediction
-                    residue_embedding = (
-                        residue_embedding
-                        * token_encoding.attention_mask.unsqueeze(dim=-1)
+            except RuntimeError:
+                logger.warning(f" number of residues in batch {sum(seq_lens)}")
+                logger.warning(f" longest seq length is {max(seq_lens)}")
+                logger.warning(f" ids are {pdb_ids}")
+                logger.warning(
+                    "RuntimeError during embedding for {} (L={})".format(
+                        pdb_ids[-1], seq_lens[-1]
+                    )
+                )
+                for id in pdb_ids:
+                    fail_ids.append(id)
+                continue
+
+            # ProtT5 appends a special tokens at the end of each sequence
+            # Mask this also out during inference while taking into account the prostt5 prefix
+            try:
+                for idx, s_len in enumerate(seq_lens):
+                    attention_mask[idx, s_len + 1] = 0
+
+                # extract last hidden states (=embeddings)
+                residue_embedding = embedding_repr.last_hidden_state.detach()
+                # mask out padded elements in the attention output (can be non-zero) for further processing/prediction
+                residue_embedding = residue_embedding * attention_mask.unsqueeze(
+                    dim=-1
+                )
+                # slice off embedding of special token prepended before to each sequence
+                residue_embedding = residue_embedding[:, 1:]
+                prediction = predictor(residue_embedding)
+
+                if output_probs:
+                    # compute max probabilities per token/residue if requested
+                    probabilities = toCPU(
+                        torch.max(
+                            F.softmax(prediction, dim=1), dim=1, keepdim=True
+                        )[0]
                     )
-                    # slice off embedding of special token prepended before to each sequence
-                    residue_embedding = residue_embedding[:, 1:]
-                    prediction = predictor(residue_embedding)
-
-                    if output_probs:
-                        # compute max probabilities per token/residue if requested
-                        probabilities = toCPU(
-                            torch.max(
-                                F.softmax(prediction, dim=1), dim=1, keepdim=True
-                            )[0]
-                        )
-
-                    prediction = toCPU(
-                        torch.max(prediction, dim=1, keepdim=True)[1]
-                    ).astype(np.byte)
 
-                    # batch-size x seq_len x embedding_dim
-                    # extra token is added at the end of the seq
-                    for batch_idx, identifier in enumerate(pdb_ids):
-                        s_len = seq_lens[batch_idx]
+                # argmax on device and downcast to uint8 before the
+                # device-to-host copy - the 20 class indices fit in one
+                # byte, an 8x smaller transfer than int64 indices
+                prediction = toCPU(
+                    torch.argmax(prediction, dim=1, keepdim=True).to(torch.uint8)
+                )
 
-                        # # slice off padding and special token appended to the end of the sequence
-                        # predictions[record_id][identifier] = prediction[
-                        #     batch_idx, :, 0:s_len
-                        # ].squeeze()
+                # batch-size x seq_len x embedding_dim
+                # extra token is added at the end of the seq
+                for batch_idx, identifier in enumerate(pdb_ids):
+                    s_len = seq_lens[batch_idx]
 
-                        # slice off padding and special token appended to the end of the sequence
-                        pred = prediction[batch_idx, :, 0:s_len].squeeze()
+                    # # slice off padding and special token appended to the end of the sequence
+                    # predictions[record_id][identifier] = prediction[
+                    #     batch_idx, :, 0:s_len
+                    # ].squeeze()
 
-                        if output_probs:  # average over per-residue max.-probabilities
-                            mean_prob = round(
-                                100 * np.mean(probabilities[batch_idx, :, 0:s_len]), 2
-                            )
-                            all_prob = probabilities[batch_idx, :, 0:s_len]
-                            predictions[record_id][identifier] = (
-                                pred,
-                                mean_prob,
-                                all_prob,
-                            )
-                        else:
-                            predictions[record_id][identifier] = (pred, None, None)
-
-                        try:
-                            len(predictions[record_id][identifier][0])
-                        except:
-                            logger.warning(
-                                f"{identifier} {record_id} prediction has length 0"
-                            )
-                            fail_ids.append(identifier)
-                            continue
+                    # slice off padding and special token appended to the end of the sequence
+                    pred = prediction[batch_idx, :, 0:s_len].squeeze()
 
-                        if s_len != len(predictions[record_id][identifier][0]):
-                            logger.warning(
-                                f"Length mismatch for {identifier}: is:{len(predictions[record_id][identifier][0])} vs should:{s_len}"
-                            )
+                    if output_probs:  # average over per-residue max.-probabilities
+                        mean_prob = round(
+                            100 * np.mean(probabilities[batch_idx, :, 0:s_len]), 2
+                        )
+                        all_prob = probabilities[batch_idx, :, 0:s_len]
+                        predictions[record_id][identifier] = (
+                            pred,
+                            mean_prob,
+                            all_prob,
+                        )
+                    else:
+                        predictions[record_id][identifier] = (pred, None, None)
+
+                    try:
+                        len(predictions[record_id][identifier][0])
+                    except:
+                        logger.warning(
+                            f"{identifier} {record_id} prediction has length 0"
+                        )
+                        fail_ids.append(identifier)
+                        continue
 
-                except IndexError:
-                    logger.warning(
-                        "Index error during prediction for {} (L={})".format(
-                            pdb_id, seq_len
+                    if s_len != len(predictions[record_id][identifier][0]):
+                        logger.warning(
+                            f"Length mismatch for {identifier}: is:{len(predictions[record_id][identifier][0])} vs should:{s_len}"
                         )
+
+            except IndexError:
+                logger.warning(
+                    "Index error during prediction for {} (L={})".format(
+                        pdb_ids[-1], seq_lens[-1]
                     )
-                    for id in pdb_ids:
-                        fail_ids.append(id)
-                    continue
+                )
+                for id in pdb_ids:
+                    fail_ids.append(id)
+                continue
 
     # write list of fails if length > 0
     if len(fail_ids) > 0:
@@ -1,9 +1,39 @@
 #!/usr/bin/env python3
+import os
 from pathlib import Path
 
 from phold.utils.external_tools import ExternalTool
 
 
+def prewarm_db(db_path: Path) -> None:
+    """
+    Warm the page cache for the files of a Foldseek database.
+
+    Issues posix_fadvise(WILLNEED) on every file belonging to the database,
+    letting the kernel read ahead asynchronously so the first search reads
+    hit the page cache rather than cold disk. No-op on platforms without
+    posix_fadvise (e.g. macOS).
+
+    Args:
+        db_path (Path): Path to the database (the files share this prefix).
+
+    Returns:
+        None
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        for db_file in Path(db_path.parent).glob(f"{db_path.name}*"):
+            fd = os.open(db_file, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+    except OSError:
+        # prewarming is best-effort only
+        pass
+
+
 def run_foldseek_search(
     query_db: Path,
     target_db: Path,
@@ -5,10 +5,13 @@ some taken from phynteny https://github.com/susiegriggo/Phynteny
 
 import binascii
 import gzip
+import io
 import multiprocessing.pool
+import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 import pandas as pd
 import pyrodigal_gv
@@ -38,14 +41,73 @@ def is_gzip_file(f: Path) -> bool:
         return binascii.hexlify(i.read(2)) == b"1f8b"
 
 
-def get_genbank(genbank: Path) -> dict:
+def _parse_genbank_chunk(chunk: str) -> list:
+    """
+    Parse the LOCUS entries in a slice of GenBank text.
+
+    Module-level so it can be pickled into a process pool worker.
+
+    Args:
+        chunk (str): GenBank format text.
+
+    Returns:
+        list: The parsed SeqRecords.
+    """
+    return list(SeqIO.parse(io.StringIO(chunk), "gb"))
+
+
+def parse_genbank_parallel(text: str, threads: int) -> Optional[dict]:
+    """
+    Parse multi-LOCUS GenBank text across a process pool.
+
+    GenBank parsing is CPU-bound, so multi-contig files are split at LOCUS
+    boundaries with a cheap text scan and each slice is parsed in its own
+    process.
+
+    Args:
+        text (str): Contents of the GenBank file.
+        threads (int): Number of worker processes.
+
+    Returns:
+        Optional[dict]: A dictionary representation of the GenBank records, or
+        None if the file has fewer than two LOCUS entries or the parallel
+        parse failed (the caller should fall back to a serial parse).
+    """
+    locus_starts = [m.start() for m in re.finditer(r"^LOCUS", text, re.M)]
+    if len(locus_starts) < 2:
+        return None
+
+    boundaries = locus_starts + [len(text)]
+    chunks = [
+        text[boundaries[i] : boundaries[i + 1]] for i in range(len(locus_starts))
+    ]
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(threads, len(chunks))
+        ) as executor:
+            record_lists = list(executor.map(_parse_genbank_chunk, chunks))
+        return SeqIO.to_dict(
+            record for records in record_lists for record in records
+        )
+    except Exception:
+        # the LOCUS split is a heuristic, so any failure here (a badly cut
+        # chunk, pickling, worker start...) falls back to the serial parse,
+        # which raises legitimately if the file is truly malformed
+        return None
+
+
+def get_genbank(genbank: Path, threads: int = 1) -> dict:
     """
     Convert a GenBank file to a dictionary.
 
     This function reads a GenBank file and converts it into a dictionary.
+    Multi-contig files are parsed in parallel when more than one thread is
+    available.
 
     Args:
         genbank (Path): Path to the GenBank file.
+        threads (int): Number of threads to use for parsing.
 
     Returns:
         dict: A dictionary representation of the GenBank file.
@@ -56,23 +118,23 @@ def get_genbank(genbank: Path) -> dict:
 
     logger.info(f"Checking if input {genbank} is a Genbank file")
 
-    if is_gzip_file(genbank.strip()):
-        try:
-            with gzip.open(genbank.strip(), "rt") as handle:
+    opener = gzip.open if is_gzip_file(genbank.strip()) else open
+
+    try:
+        gb_dict = None
+        if threads > 1:
+            # the whole text is only needed to split it for the workers
+            with opener(genbank.strip(), "rt") as handle:
+                text = handle.read()
+            gb_dict = parse_genbank_parallel(text, threads)
+            del text
+        if gb_dict is None:
+            # serial path streams straight from the handle
+            with opener(genbank.strip(), "rt") as handle:
                 gb_dict = SeqIO.to_dict(SeqIO.parse(handle, "gb"))
-            handle.close()
-        except ValueError:
-            logger.warning(f"{genbank.strip()} is not a genbank file")
-            raise
-
-    else:
-        try:
-            with open(genbank.strip(), "rt") as handle:
-                gb_dict = SeqIO.to_dict(SeqIO.parse(handle, "gb"))
-            handle.close()
-        except ValueError:
-            logger.warning(f"{genbank} is not a genbank file")
-            raise
+    except ValueError:
+        logger.warning(f"{genbank.strip()} is not a genbank file")
+        raise
 
     return gb_dict
 
@@ -0,0 +1,35 @@
+"""
+Optional numba-accelerated kernel for the plot label thinning.
+
+Importing this module must never fail: when numba is not installed,
+thin_by_gap is None and callers fall back to the NumPy implementation.
+Results are identical either way.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    @njit(cache=True)
+    def thin_by_gap(pos: np.ndarray, min_gap: float) -> np.ndarray:
+        """
+        Return indices of positions at least min_gap after their predecessor.
+
+        Args:
+            pos (np.ndarray): Feature midpoint positions, in positional order.
+            min_gap (float): Minimum gap between consecutive positions.
+
+        Returns:
+            np.ndarray: Indices of the kept positions (the first is always kept).
+        """
+        kept = np.empty(pos.size, dtype=np.int64)
+        n_kept = 0
+        for i in range(pos.size):
+            if i == 0 or pos[i] > pos[i - 1] + min_gap:
+                kept[n_kept] = i
+                n_kept += 1
+        return kept[:n_kept]
+
+except ImportError:
+    thin_by_gap = None
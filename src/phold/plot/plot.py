@@ -1,5 +1,14 @@
+import re
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, List
+
+import matplotlib
+
+# the plots are only ever written to file, so pin the headless Agg backend
+# before anything touches matplotlib - GUI backends probe the display server
+# and are not safe under the per-contig process pool
+matplotlib.use("Agg")
 
 from loguru import logger
 from pycirclize import Circos
@@ -11,6 +20,155 @@ from Bio import SeqUtils
 from Bio.Seq import Seq
 from Bio.SeqFeature import SeqFeature
 
+from phold.plot._thin_numba import thin_by_gap
+
+# exact function string -> data_dict category key
+FUNCTION_TO_KEY = {
+    "unknown function": "unk",
+    "other": "other",
+    "tail": "tail",
+    "transcription regulation": "transcription",
+    "lysis": "lysis",
+    "integration and excision": "int",
+    "head and packaging": "head",
+    "connector": "con",
+}
+
+# category key -> plot colour, in track draw order
+CATEGORY_COLORS = (
+    ("acr_defense_vfdb_card", "#FF0000"),
+    ("unk", "#AAAAAA"),
+    ("other", "#4deeea"),
+    ("tail", "#74ee15"),
+    ("transcription", "#ffe700"),
+    ("dna", "#f000ff"),
+    ("lysis", "#001eff"),
+    ("moron", "#8900ff"),
+    ("int", "#E0B0FF"),
+    ("head", "#ff008d"),
+    ("con", "#5A5A5A"),
+)
+
+# legend display order and labels for the category keys
+LEGEND_ORDER = (
+    ("unk", "Unknown Function"),
+    ("other", "Other Function"),
+    ("transcription", "Transcription Regulation"),
+    ("dna", "DNA/RNA & nucleotide \n metabolism"),
+    ("lysis", "Lysis"),
+    ("moron", "Moron, auxiliary metabolic \n gene & host takeover"),
+    ("int", "Integration & excision"),
+    ("head", "Head & packaging"),
+    ("con", "Connector"),
+    ("tail", "Tail"),
+    ("acr_defense_vfdb_card", "VF/AMR/ACR/DF"),
+)
+
+# compiled attribute chains - one C-level call instead of two lookups
+_feature_start = attrgetter("location.start")
+_feature_end = attrgetter("location.end")
+
+# phrog qualifier tokens that route a CDS to the VF/AMR/ACR/DF category -
+# precompiled so each phrog string is scanned once, not once per token
+VFDB_CARD_RE = re.compile("vfdb|card|acr|defensefinder")
+
+
+def thin_features_by_gap(
+    features: List[SeqFeature], label: str, min_gap: int = 500
+) -> tuple:
+    """
+    Thin out features so consecutive labels are at least min_gap apart.
+
+    Args:
+        features (List[SeqFeature]): Features to thin, in positional order.
+        label (str): Label to attach to every kept feature.
+        min_gap (int): Minimum gap in bp between consecutive label midpoints.
+
+    Returns:
+        tuple: Lists of kept midpoint positions, labels and feature lengths.
+    """
+    if len(features) == 0:
+        return [], [], []
+
+    starts = np.fromiter(
+        (int(_feature_start(f)) for f in features), dtype=np.int64, count=len(features)
+    )
+    ends = np.fromiter(
+        (int(_feature_end(f)) for f in features), dtype=np.int64, count=len(features)
+    )
+    pos = (starts + ends) / 2.0
+
+    # always keep the first feature, then keep any feature at least min_gap
+    # away from its predecessor - via the numba kernel when available (no
+    # NumPy temporaries on very dense contigs), otherwise inside NumPy
+    if thin_by_gap is not None:
+        kept = thin_by_gap(pos, float(min_gap))
+    else:
+        keep = np.empty(pos.size, dtype=bool)
+        keep[0] = True
+        keep[1:] = np.diff(pos) > min_gap
+        kept = np.flatnonzero(keep)
+
+    return pos[kept].tolist(), [label] * kept.size, (ends - starts)[kept].tolist()
+
+
+def _kb_label(value: float) -> str:
+    """Format an axis position in bp as a Kb tick label (no decimal place)."""
+    return f"{value / 1000:.0f} Kb"
+
+
+def calc_gc_content_skew(contig_sequence: Seq) -> tuple:
+    """
+    Calculate windowed GC content and GC skew in one pass over the sequence.
+
+    Uses the same window/step conventions as pycirclize's calc_gc_content and
+    calc_gc_skew (and biopython's gc_fraction with ambiguous="remove"), but
+    replaces their per-window Python scans with cumulative sums over a byte
+    view of the sequence, so the whole sequence is swept once per base mask
+    instead of once per window.
+
+    Args:
+        contig_sequence (Seq): Nucleotide sequence of the contig.
+
+    Returns:
+        tuple: Window midpoint positions, GC content (%) and GC skew arrays.
+    """
+    seq_len = len(contig_sequence)
+    window_size = int(seq_len / 500)
+    step_size = int(seq_len / 1000)
+    if window_size == 0 or step_size == 0:
+        window_size, step_size = seq_len, int(seq_len / 2)
+
+    pos_list = np.array([*range(0, seq_len, step_size), seq_len], dtype=np.int64)
+
+    buf = np.frombuffer(str(contig_sequence).upper().encode("latin-1"), dtype=np.uint8)
+    is_g = buf == ord("G")
+    is_c = buf == ord("C")
+    is_s = buf == ord("S")
+    # unambiguous AT-side nucleotides, per gc_fraction(ambiguous="remove")
+    is_atwu = (
+        (buf == ord("A")) | (buf == ord("T")) | (buf == ord("W")) | (buf == ord("U"))
+    )
+
+    def windowed_counts(mask):
+        csum = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        half_window = int(window_size / 2)
+        starts = np.clip(pos_list - half_window, 0, seq_len)
+        ends = np.clip(pos_list + half_window, 0, seq_len)
+        return csum[ends] - csum[starts]
+
+    g_counts = windowed_counts(is_g)
+    c_counts = windowed_counts(is_c)
+    gcs_counts = g_counts + c_counts + windowed_counts(is_s)
+    lengths = gcs_counts + windowed_counts(is_atwu)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gc_contents = np.where(lengths == 0, 0.0, gcs_counts / lengths) * 100
+        gc_counts = g_counts + c_counts
+        gc_skews = np.where(gc_counts == 0, 0.0, (g_counts - c_counts) / gc_counts)
+
+    return pos_list, gc_contents, gc_skews
+
 
 def create_circos_plot(
     contig_id: str,
@@ -30,6 +188,7 @@ def create_circos_plot(
     label_hypotheticals: bool,
     remove_other_features_labels: bool,
     label_force_list: List[str],
+    formats: Iterable[str] = ("png", "svg"),
 ) -> None:
     """
     Create a Circos plot for a given contig.
@@ -52,13 +211,13 @@ def create_circos_plot(
         label_hypotheticals (bool): Whether to include hypothetical labels.
         remove_other_features_labels (bool): Whether to remove labels for other features.
         label_force_list (List[str]): List of feature IDs to force label.
+        formats (Iterable[str]): Image formats to save the plot in.
 
     Returns:
         None
     """
 
-    png_plot_file: Path = Path(output) / f"{contig_id}.png"
-    svg_plot_file: Path = Path(output) / f"{contig_id}.svg"
+    output = Path(output)
 
     # instantiate circos
     seq_len = gb_size_dict[contig_id]
@@ -73,292 +232,169 @@ def create_circos_plot(
     cds_track = sector.add_track((70, 80))
     cds_track.axis(fc="#EEEEEE", ec="none")
 
+    # per-plot feature lists over the shared colour table
     data_dict = {
-        "acr_defense_vfdb_card": {"col": "#FF0000", "fwd_list": [], "rev_list": []},
-        "unk": {"col": "#AAAAAA", "fwd_list": [], "rev_list": []},
-        "other": {"col": "#4deeea", "fwd_list": [], "rev_list": []},
-        "tail": {"col": "#74ee15", "fwd_list": [], "rev_list": []},
-        "transcription": {"col": "#ffe700", "fwd_list": [], "rev_list": []},
-        "dna": {"col": "#f000ff", "fwd_list": [], "rev_list": []},
-        "lysis": {"col": "#001eff", "fwd_list": [], "rev_list": []},
-        "moron": {"col": "#8900ff", "fwd_list": [], "rev_list": []},
-        "int": {"col": "#E0B0FF", "fwd_list": [], "rev_list": []},
-        "head": {"col": "#ff008d", "fwd_list": [], "rev_list": []},
-        "con": {"col": "#5A5A5A", "fwd_list": [], "rev_list": []},
+        key: {"col": col, "fwd_list": [], "rev_list": []}
+        for key, col in CATEGORY_COLORS
     }
 
-    fwd_features = [
-        feature
-        for feature in gb_feature_dict[contig_id]
-        if feature.location.strand == 1
-    ]
-    rev_features = [
-        feature
-        for feature in gb_feature_dict[contig_id]
-        if feature.location.strand == -1
-    ]
-    cds_features = [
-        feature for feature in gb_feature_dict[contig_id] if feature.type == "CDS"
-    ]
-    trna_features = [
-        feature for feature in gb_feature_dict[contig_id] if feature.type == "tRNA"
-    ]
-    tmrna_features = [
-        feature for feature in gb_feature_dict[contig_id] if feature.type == "tmRNA"
-    ]
-    crispr_features = [
-        feature
-        for feature in gb_feature_dict[contig_id]
-        if feature.type == "repeat_region"
-    ]
+    # partition the features by strand and type in a single pass rather than
+    # one comprehension (and one full iteration) per list
+    fwd_features = []
+    rev_features = []
+    features_by_type = {"CDS": [], "tRNA": [], "tmRNA": [], "repeat_region": []}
+
+    for feature in gb_feature_dict[contig_id]:
+        strand = feature.location.strand
+        if strand == 1:
+            fwd_features.append(feature)
+        elif strand == -1:
+            rev_features.append(feature)
+        type_list = features_by_type.get(feature.type)
+        if type_list is not None:
+            type_list.append(feature)
+
+    cds_features = features_by_type["CDS"]
+    trna_features = features_by_type["tRNA"]
+    tmrna_features = features_by_type["tmRNA"]
+    crispr_features = features_by_type["repeat_region"]
+
+    # classify the CDS into categories in one pass - the exact function
+    # strings go through the dispatch table, with the substring fallbacks
+    # kept for pharokka compatibility ("DNA...", "moron...")
+    for f in cds_features:
+        strand = f.location.strand
+        if strand == 1:
+            side = "fwd_list"
+        elif strand == -1:
+            side = "rev_list"
+        else:
+            continue
+
+        # bind the qualifiers dict once per feature
+        quals = f.qualifiers
+        phrog0 = quals.get("phrog")[0]
+        func0 = quals.get("function")[0]
+
+        # vfdb or card or acr or defensefinder
+        if VFDB_CARD_RE.search(phrog0):
+            key = "acr_defense_vfdb_card"
+        else:  # no vfdb or card
+            key = FUNCTION_TO_KEY.get(func0)
+            if key is None:
+                # to make compatible with pharokka
+                if "DNA" in func0:
+                    key = "dna"
+                elif "moron" in func0:
+                    key = "moron"
+
+        if key is not None:
+            data_dict[key][side].append(f)
+
+    # add the tracks now - skip empty category lists so matplotlib does not
+    # construct a patch collection for nothing
+    for key, track_data in data_dict.items():
+        # fwd
+        if track_data["fwd_list"]:
+            cds_track.genomic_features(
+                track_data["fwd_list"],
+                plotstyle="arrow",
+                r_lim=(75, 80),
+                fc=track_data["col"],
+            )
+        # rev
+        if track_data["rev_list"]:
+            cds_track.genomic_features(
+                track_data["rev_list"],
+                plotstyle="arrow",
+                r_lim=(70, 75),
+                fc=track_data["col"],
+            )
+
+    #### Extra Features
+    ###################################################
+
+    extras_col = "black"
 
-    # fwd features first
+    # the per-type lists from the single-pass partition already hold the
+    # extras - just split them by strand rather than re-scanning fwd/rev
+    extra_features = trna_features + tmrna_features
+    fwd_list = [f for f in extra_features if f.location.strand == 1]
+    rev_list = [f for f in extra_features if f.location.strand == -1]
 
-    for f in fwd_features:
-        if f.type == "CDS":
-            if (
-                "vfdb" in f.qualifiers.get("phrog")[0]
-                or "card" in f.qualifiers.get("phrog")[0]
-                or "acr" in f.qualifiers.get("phrog")[0]
-                or "defensefinder" in f.qualifiers.get("phrog")[0]
-            ):  # vfdb or card or acr or defensefinder
-                data_dict["acr_defense_vfdb_card"]["fwd_list"].append(f)
-            else:  # no vfdb or card
-                if f.qualifiers.get("function")[0] == "unknown function":
-                    data_dict["unk"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "other":
-                    data_dict["other"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "tail":
-                    data_dict["tail"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "transcription regulation":
-                    data_dict["transcription"]["fwd_list"].append(f)
-                elif (
-                    "DNA" in f.qualifiers.get("function")[0]
-                ):  # to make compatible with pharokka
-                    data_dict["dna"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "lysis":
-                    data_dict["lysis"]["fwd_list"].append(f)
-                elif (
-                    "moron" in f.qualifiers.get("function")[0]
-                ):  # to make compatible with pharokka
-                    data_dict["moron"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "integration and excision":
-                    data_dict["int"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "head and packaging":
-                    data_dict["head"]["fwd_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "connector":
-                    data_dict["con"]["fwd_list"].append(f)
-
-    for f in rev_features:
-        if f.type == "CDS":
-            if (
-                "vfdb" in f.qualifiers.get("phrog")[0]
-                or "card" in f.qualifiers.get("phrog")[0]
-                or "acr" in f.qualifiers.get("phrog")[0]
-                or "defensefinder" in f.qualifiers.get("phrog")[0]
-            ):  # vfdb or card or acr or defensefinder
-                data_dict["acr_defense_vfdb_card"]["rev_list"].append(f)
-            else:  # no vfdb or card
-                if f.qualifiers.get("function")[0] == "unknown function":
-                    data_dict["unk"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "other":
-                    data_dict["other"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "tail":
-                    data_dict["tail"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "transcription regulation":
-                    data_dict["transcription"]["rev_list"].append(f)
-                elif (
-                    "DNA" in f.qualifiers.get("function")[0]
-                ):  # to make compatible with pharokka
-                    data_dict["dna"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "lysis":
-                    data_dict["lysis"]["rev_list"].append(f)
-                elif (
-                    "moron" in f.qualifiers.get("function")[0]
-                ):  # to make compatible with pharokka
-                    data_dict["moron"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "integration and excision":
-                    data_dict["int"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "head and packaging":
-                    data_dict["head"]["rev_list"].append(f)
-                elif f.qualifiers.get("function")[0] == "connector":
-                    data_dict["con"]["rev_list"].append(f)
-
-    # add the tracks now
-    # fwd
-    for key in data_dict.keys():
+    if fwd_list:
         cds_track.genomic_features(
-            data_dict[key]["fwd_list"],
+            fwd_list,
             plotstyle="arrow",
             r_lim=(75, 80),
-            fc=data_dict[key]["col"],
+            fc=extras_col,
         )
-        # rev
+
+    if rev_list:
         cds_track.genomic_features(
-            data_dict[key]["rev_list"],
+            rev_list,
             plotstyle="arrow",
             r_lim=(70, 75),
-            fc=data_dict[key]["col"],
+            fc=extras_col,
         )
 
-    #### Extra Features
-    ###################################################
-
-    extras_col = "black"
-
-    fwd_list = []
-    for f in fwd_features:
-        if f.type in ["tRNA", "tmRNA", "tmRNA"]:
-            fwd_list.append(f)
-
-    cds_track.genomic_features(
-        fwd_list,
-        plotstyle="arrow",
-        r_lim=(75, 80),
-        fc=extras_col,
-    )
-
-    rev_list = []
-    for f in rev_features:
-        if f.type in ["tRNA", "tmRNA", "tmRNA"]:
-            rev_list.append(f)
-
-    cds_track.genomic_features(
-        rev_list,
-        plotstyle="arrow",
-        r_lim=(70, 75),
-        fc=extras_col,
-    )
-
     ##################################
     ####### thin out extra features #########
     ##################################
 
     if remove_other_features_labels == False:
-        # trna
-        pos_list_trna, labels_trna, length_list_trna = [], [], []
-        for f in trna_features:
-            start, end = int(str(f.location.end)), int(str(f.location.start))
-            pos = (start + end) / 2.0
-            length = end - start
-            label = "tRNA"
-            pos_list_trna.append(pos)
-            labels_trna.append(label)
-            length_list_trna.append(length)
-
-        # if trnas exist
-        if len(length_list_trna) > 0:
-            # thin out the trnas to avoid overlaps
-            # Create an empty list to store the filtered indices
-            filtered_indices_trna = []
-            # add the first tRNA
-            filtered_indices_trna.append(0)
-
-            for i in range(1, len(length_list_trna)):
-                # If the position of the trna is at least 500bp away from the previous, add it
-                if pos_list_trna[i] > (pos_list_trna[i - 1] + 500):
-                    filtered_indices_trna.append(i)
-
-            # Use the filtered indices to create new lists for pos_list, labels, and length_list
-            pos_list_trna = [pos_list_trna[i] for i in filtered_indices_trna]
-            labels_trna = [labels_trna[i] for i in filtered_indices_trna]
-            length_list_trna = [length_list_trna[i] for i in filtered_indices_trna]
-
-        # tmrna
-        pos_list_tmrna, labels_tmrna, length_list_tmrna = [], [], []
-        for f in tmrna_features:
-            start, end = int(str(f.location.end)), int(str(f.location.start))
-            pos = (start + end) / 2.0
-            length = end - start
-            label = "tmRNA"
-            pos_list_tmrna.append(pos)
-            labels_tmrna.append(label)
-            length_list_tmrna.append(length)
-
-        if len(length_list_tmrna) > 0:
-            # thin out the trnas to avoid overlaps
-            # Create an empty list to store the filtered indices
-            filtered_indices_tmrna = []
-            # add the first tmRNA
-            filtered_indices_tmrna.append(0)
-
-            for i in range(1, len(length_list_tmrna)):
-                # If the position of the tmRNA is at least 500bp away from the previous, add it
-                if pos_list_tmrna[i] > (pos_list_tmrna[i - 1] + 500):
-                    filtered_indices_tmrna.append(i)
-
-            # Use the filtered indices to create new lists for pos_list, labels, and length_list
-            pos_list_tmrna = [pos_list_tmrna[i] for i in filtered_indices_tmrna]
-            labels_tmrna = [labels_tmrna[i] for i in filtered_indices_tmrna]
-            length_list_tmrna = [length_list_tmrna[i] for i in filtered_indices_tmrna]
-
-        # crispr
-        pos_list_crispr, labels_crispr, length_list_crispr = [], [], []
-        for f in crispr_features:
-            start, end = int(str(f.location.end)), int(str(f.location.start))
-            pos = (start + end) / 2.0
-            length = end - start
-            label = "CRISPR"
-            pos_list_crispr.append(pos)
-            labels_crispr.append(label)
-            length_list_crispr.append(length)
-
-        if len(length_list_crispr) > 0:
-            # thin out the crisprs to avoid overlaps
-            # Create an empty list to store the filtered indices
-            filtered_indices_crispr = []
-            # add the first crispr
-            filtered_indices_crispr.append(0)
-
-            for i in range(1, len(length_list_tmrna)):
-                # If the position of the crispr is at least 500bp away from the previous, add it
-                if pos_list_crispr[i] > (pos_list_crispr[i - 1] + 500):
-                    filtered_indices_crispr.append(i)
-
-            # Use the filtered indices to create new lists for pos_list, labels, and length_list
-            pos_list_crispr = [pos_list_crispr[i] for i in filtered_indices_crispr]
-            labels_crispr = [labels_crispr[i] for i in filtered_indices_crispr]
-            length_list_crispr = [
-                length_list_crispr[i] for i in filtered_indices_crispr
-            ]
+        # thin out each label track to avoid overlaps (at least 500 bp apart)
+        pos_list_trna, labels_trna, length_list_trna = thin_features_by_gap(
+            trna_features, "tRNA"
+        )
+        pos_list_tmrna, labels_tmrna, length_list_tmrna = thin_features_by_gap(
+            tmrna_features, "tmRNA"
+        )
+        pos_list_crispr, labels_crispr, length_list_crispr = thin_features_by_gap(
+            crispr_features, "CRISPR"
+        )
 
     ##################################
     ####### truncate CDS labels
     ##################################
 
-    # Extract CDS product labels
-    pos_list, labels, length_list, id_list = [], [], [], []
-    for f in cds_features:
-        start, end = int(str(f.location.end)), int(str(f.location.start))
-        pos = (start + end) / 2.0
-        length = end - start
-        label = f.qualifiers.get("product", [""])[0]
-        id = f.qualifiers.get("ID", [""])[0]
+    # set membership is O(1) vs O(N) on the force label list
+    force_set = set(label_force_list)
+
+    def make_label_entry(f: SeqFeature):
+        # returns a (pos, label, length, id) tuple, or None for CDS that
+        # should not be labelled
+        # location bounds are ExactPosition (an int subclass) - no need to
+        # round-trip through str
+        start, end = int(f.location.end), int(f.location.start)
+        quals = f.qualifiers
+        label = quals.get("product", [""])[0]
+        id = quals.get("ID", [""])[0]
 
         # skip hypotheticals if the flag is false (default)
-        if id in label_force_list:  # if in the list
-            if len(label) > truncate:
-                label = label[:truncate] + "..."
-            pos_list.append(pos)
-            labels.append(label)
-            length_list.append(length)
-            id_list.append(id)
-            continue  # to break if in the list
-        else:
-            if label_hypotheticals is False:
-                if (
-                    label == ""
-                    or label.startswith("hypothetical")
-                    or label.startswith("unknown")
-                ):
-                    continue  # if hypothetical not in the list
-                else:  # all others
-                    if len(label) > truncate:
-                        label = label[:truncate] + "..."
-                    pos_list.append(pos)
-                    labels.append(label)
-                    length_list.append(length)
-                    id_list.append(id)
+        # force-listed CDS are always labelled
+        if id not in force_set:
+            if label_hypotheticals is True:
+                return None
+            if (
+                label == ""
+                or label.startswith("hypothetical")
+                or label.startswith("unknown")
+            ):
+                return None  # if hypothetical not in the list
+
+        if len(label) > truncate:
+            label = label[:truncate] + "..."
+        return ((start + end) / 2.0, label, end - start, id)
+
+    # Extract CDS product labels - single comprehension, transposed in C
+    label_entries = [
+        entry for entry in map(make_label_entry, cds_features) if entry is not None
+    ]
+    if label_entries:
+        pos_list, labels, length_list, id_list = map(list, zip(*label_entries))
+    else:
+        pos_list, labels, length_list, id_list = [], [], [], []
 
     ###################################################
     #### thin out CDS annotations
@@ -381,21 +417,20 @@ def create_circos_plot(
 
     ####### running the sparsity
 
-    quantile_length = np.quantile(length_list, annotations)
-    # Create an empty list to store the filtered indices
-    filtered_indices = []
+    lengths_arr = np.asarray(length_list)
+    quantile_length = np.quantile(lengths_arr, annotations)
 
-    # Loop through the indices of the length_list
-    for i in range(len(length_list)):
-        # If the length at this index is greater than or equal to the median, add the index to filtered_indices
-        # captures the once in the label force list
-        if (length_list[i] < quantile_length) or (id_list[i] in label_force_list):
-            filtered_indices.append(i)
+    # keep everything below the quantile cutoff, plus anything in the label
+    # force list - one boolean mask instead of a Python index loop
+    in_force = np.fromiter(
+        (id in force_set for id in id_list), dtype=bool, count=len(id_list)
+    )
+    kept = np.flatnonzero((lengths_arr < quantile_length) | in_force)
 
-    # Use the filtered indices to create new lists for pos_list, labels, and length_list
-    pos_list = [pos_list[i] for i in filtered_indices]
-    labels = [labels[i] for i in filtered_indices]
-    length_list = [length_list[i] for i in filtered_indices]
+    # Use the kept indices to create new lists for pos_list, labels, and length_list
+    pos_list = [pos_list[i] for i in kept]
+    labels = [labels[i] for i in kept]
+    length_list = lengths_arr[kept].tolist()
 
     # Plot CDS product labels on outer position
     cds_track.xticks(
@@ -447,37 +482,49 @@ def create_circos_plot(
     gc_skew_start = 25
     gc_skew_end = 42.5
 
+    # compute both GC tracks with one set of cumulative sums over the
+    # sequence, rather than pycirclize's per-window Python scans
+    gc_pos_list, gc_contents, gc_skews = calc_gc_content_skew(contig_sequence)
+
     # Plot GC content
     gc_content_track = sector.add_track((gc_content_start, gc_content_end))
-    pos_list, gc_contents = gbk.calc_gc_content(seq=contig_sequence)
     gc_contents = (
         gc_contents - SeqUtils.gc_fraction(contig_sequence) * 100
     )  # needs biopython >=1.80
-    positive_gc_contents = np.where(gc_contents > 0, gc_contents, 0)
-    negative_gc_contents = np.where(gc_contents < 0, gc_contents, 0)
-    abs_max_gc_content = np.max(np.abs(gc_contents))
+    # one clip pass per side and reuse the abs array for the max -
+    # two fewer full sweeps over the GC array than the np.where pairs
+    abs_gc_contents = np.abs(gc_contents)
+    abs_max_gc_content = abs_gc_contents.max()
+    positive_gc_contents = np.clip(gc_contents, 0, None)
+    negative_gc_contents = np.clip(gc_contents, None, 0)
     vmin, vmax = -abs_max_gc_content, abs_max_gc_content
-    gc_content_track.fill_between(
-        pos_list, positive_gc_contents, 0, vmin=vmin, vmax=vmax, color="black"
-    )
-    gc_content_track.fill_between(
-        pos_list, negative_gc_contents, 0, vmin=vmin, vmax=vmax, color="grey"
-    )
+    # skip all-zero series - matplotlib would still tessellate a
+    # zero-area polygon for them
+    if positive_gc_contents.any():
+        gc_content_track.fill_between(
+            gc_pos_list, positive_gc_contents, 0, vmin=vmin, vmax=vmax, color="black"
+        )
+    if negative_gc_contents.any():
+        gc_content_track.fill_between(
+            gc_pos_list, negative_gc_contents, 0, vmin=vmin, vmax=vmax, color="grey"
+        )
 
     # Plot GC skew
     gc_skew_track = sector.add_track((gc_skew_start, gc_skew_end))
 
-    pos_list, gc_skews = gbk.calc_gc_skew(seq=contig_sequence)
-    positive_gc_skews = np.where(gc_skews > 0, gc_skews, 0)
-    negative_gc_skews = np.where(gc_skews < 0, gc_skews, 0)
-    abs_max_gc_skew = np.max(np.abs(gc_skews))
+    abs_gc_skews = np.abs(gc_skews)
+    abs_max_gc_skew = abs_gc_skews.max()
+    positive_gc_skews = np.clip(gc_skews, 0, None)
+    negative_gc_skews = np.clip(gc_skews, None, 0)
     vmin, vmax = -abs_max_gc_skew, abs_max_gc_skew
-    gc_skew_track.fill_between(
-        pos_list, positive_gc_skews, 0, vmin=vmin, vmax=vmax, color="green"
-    )
-    gc_skew_track.fill_between(
-        pos_list, negative_gc_skews, 0, vmin=vmin, vmax=vmax, color="purple"
-    )
+    if positive_gc_skews.any():
+        gc_skew_track.fill_between(
+            gc_pos_list, positive_gc_skews, 0, vmin=vmin, vmax=vmax, color="green"
+        )
+    if negative_gc_skews.any():
+        gc_skew_track.fill_between(
+            gc_pos_list, negative_gc_skews, 0, vmin=vmin, vmax=vmax, color="purple"
+        )
 
     label_size = int(label_size)
 
@@ -486,7 +533,7 @@ def create_circos_plot(
         interval=int(interval),
         outer=False,
         show_bottom_line=False,
-        label_formatter=lambda v: f"{v/ 1000:.0f} Kb",  # no decimal place
+        label_formatter=_kb_label,
         label_orientation="vertical",
         line_kws=dict(ec="grey"),
         label_size=7,
@@ -498,24 +545,7 @@ def create_circos_plot(
 
     # # Add legend
     handle_phrogs = [
-        Patch(color=data_dict["unk"]["col"], label="Unknown Function"),
-        Patch(color=data_dict["other"]["col"], label="Other Function"),
-        Patch(
-            color=data_dict["transcription"]["col"], label="Transcription Regulation"
-        ),
-        Patch(
-            color=data_dict["dna"]["col"], label="DNA/RNA & nucleotide \n metabolism"
-        ),
-        Patch(color=data_dict["lysis"]["col"], label="Lysis"),
-        Patch(
-            color=data_dict["moron"]["col"],
-            label="Moron, auxiliary metabolic \n gene & host takeover",
-        ),
-        Patch(color=data_dict["int"]["col"], label="Integration & excision"),
-        Patch(color=data_dict["head"]["col"], label="Head & packaging"),
-        Patch(color=data_dict["con"]["col"], label="Connector"),
-        Patch(color=data_dict["tail"]["col"], label="Tail"),
-        Patch(color=data_dict["acr_defense_vfdb_card"]["col"], label="VF/AMR/ACR/DF"),
+        Patch(color=data_dict[key]["col"], label=label) for key, label in LEGEND_ORDER
     ]
 
     fig = circos.plotfig()
@@ -620,8 +650,7 @@ def create_circos_plot(
 
     dpi = int(dpi)
 
-    # save as png
-    fig.savefig(png_plot_file, dpi=dpi)
-
-    # Save the image as an SVG
-    fig.savefig(svg_plot_file, format="svg", dpi=dpi)
+    # save each requested format from the same rendered figure - callers
+    # that only need the PNG can skip the second full SVG render
+    for fmt in formats:
+        fig.savefig(output / f"{contig_id}.{fmt}", format=fmt, dpi=dpi)
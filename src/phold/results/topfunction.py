@@ -1,11 +1,28 @@
 #!/usr/bin/env python3
-import copy
 from pathlib import Path
 from typing import Dict, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 
+# tophit fields slotted into each CDS's results entry during the merge
+TOPHIT_COLUMNS = (
+    "phrog",
+    "product",
+    "function",
+    "tophit_protein",
+    "bitscore",
+    "fident",
+    "evalue",
+    "qStart",
+    "qEnd",
+    "qLen",
+    "tStart",
+    "tEnd",
+    "tLen",
+)
+
 
 def get_topfunctions(
     result_tsv: Path,
@@ -48,40 +65,84 @@ def get_topfunctions(
         "tLen",
     ]
 
-    foldseek_df = pd.read_csv(
-        result_tsv, delimiter="\t", index_col=False, names=col_list
+    # explicit dtypes skip type inference, and the pyarrow engine parses the
+    # (potentially huge) Foldseek TSV with a multithreaded tokenizer.
+    # bitscore and fident are left to inference on purpose: foldseek emits
+    # integer bitscores and forcing a float dtype would change how they are
+    # printed in the output TSVs
+    read_csv_kwargs = dict(
+        sep="\t",
+        header=None,
+        names=col_list,
+        dtype={
+            "query": str,
+            "target": str,
+            "evalue": "float64",
+            "qStart": "int32",
+            "qEnd": "int32",
+            "qLen": "int32",
+            "tStart": "int32",
+            "tEnd": "int32",
+            "tLen": "int32",
+        },
     )
+    try:
+        foldseek_df = pd.read_csv(result_tsv, engine="pyarrow", **read_csv_kwargs)
+    except (ImportError, TypeError, ValueError):
+        # pyarrow missing or an option unsupported by this pandas version
+        foldseek_df = pd.read_csv(result_tsv, **read_csv_kwargs)
+
+    def split_unique(column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        # split only the unique strings and broadcast the two halves back
+        # through the categorical codes - queries repeat once per hit, so
+        # this does K splits instead of N
+        as_category = column.astype("category")
+        parts = as_category.cat.categories.str.split(":", n=1, expand=True)
+        codes = as_category.cat.codes.to_numpy()
+        return (
+            parts.get_level_values(0).to_numpy()[codes],
+            parts.get_level_values(1).to_numpy()[codes],
+        )
 
     # gets the cds
     if pdb is False and proteins_flag is False:
         # prostt5
-        foldseek_df[["contig_id", "cds_id"]] = foldseek_df["query"].str.split(
-            ":", expand=True, n=1
+        foldseek_df["contig_id"], foldseek_df["cds_id"] = split_unique(
+            foldseek_df["query"]
         )
     # pdb or proteins_flag or both
     else:
-        foldseek_df["cds_id"] = foldseek_df["query"].str.replace(".pdb", "")
+        foldseek_df["cds_id"] = foldseek_df["query"].str.removesuffix(".pdb")
 
     # clean up later
     if database_name == "all_phold_structures" or database_name == "all_phold_prostt5":
-        foldseek_df["target"] = foldseek_df["target"].str.replace(".pdb", "")
+        foldseek_df["target"] = foldseek_df["target"].str.removesuffix(".pdb")
         # split the target column as this will have phrog:protein
-        foldseek_df[["phrog", "tophit_protein"]] = foldseek_df["target"].str.split(
-            ":", expand=True, n=1
+        foldseek_df["phrog"], foldseek_df["tophit_protein"] = split_unique(
+            foldseek_df["target"]
         )
 
     foldseek_df = foldseek_df.drop(columns=["target"])
     foldseek_df["phrog"] = foldseek_df["phrog"].str.replace("phrog_", "")
 
-    mask = foldseek_df["phrog"].str.startswith("envhog_")
-    # strip off envhog
-    foldseek_df.loc[mask, "phrog"] = foldseek_df.loc[mask, "phrog"].str.replace(
-        "envhog_", ""
-    )
-    # add envhog to protein
-    foldseek_df.loc[mask, "tophit_protein"] = (
-        "envhog_" + foldseek_df.loc[mask, "tophit_protein"]
+    # rewrite the envhog rows directly on the underlying arrays - the paired
+    # .loc reads and writes each re-indexed and aligned, and str.replace ran
+    # the regex engine per cell where a prefix slice is enough
+    phrogs = foldseek_df["phrog"].to_numpy(copy=True)
+    proteins = foldseek_df["tophit_protein"].to_numpy(copy=True)
+    envhog_rows = np.flatnonzero(
+        np.fromiter(
+            (phrog.startswith("envhog_") for phrog in phrogs),
+            dtype=bool,
+            count=len(phrogs),
+        )
     )
+    if envhog_rows.size:
+        # strip off envhog from the phrog, add it to the protein
+        phrogs[envhog_rows] = [phrogs[i][len("envhog_") :] for i in envhog_rows]
+        proteins[envhog_rows] = ["envhog_" + proteins[i] for i in envhog_rows]
+        foldseek_df["phrog"] = phrogs
+        foldseek_df["tophit_protein"] = proteins
 
     foldseek_df["phrog"] = foldseek_df["phrog"].astype("str")
 
@@ -90,132 +151,146 @@ def get_topfunctions(
     phrog_mapping_df = pd.read_csv(phrog_annot_mapping_tsv, sep="\t")
     phrog_mapping_df["phrog"] = phrog_mapping_df["phrog"].astype("str")
 
-    # join the dfs
-    foldseek_df = foldseek_df.merge(phrog_mapping_df, on="phrog", how="left")
+    # the mapping is one row per phrog, so bring the annotation columns over
+    # with dict-backed maps - one hash lookup per row, no join machinery and
+    # no copied frame (misses stay NaN exactly as with the left merge)
+    phrog_keys = phrog_mapping_df["phrog"]
+    for annot_column in phrog_mapping_df.columns:
+        if annot_column == "phrog":
+            continue
+        foldseek_df[annot_column] = foldseek_df["phrog"].map(
+            dict(zip(phrog_keys, phrog_mapping_df[annot_column]))
+        )
 
     # Replace NaN values in the 'product' column with 'hypothetical protein'
     foldseek_df["product"] = foldseek_df["product"].fillna("hypothetical protein")
 
+    # these columns are low-cardinality strings hit by every following mask,
+    # sort and pivot - as categoricals those operations compare small integer
+    # codes instead of strings
+    for column in ("phrog", "function", "product"):
+        foldseek_df[column] = foldseek_df[column].astype("category")
+
     # filter out rows of foldseek_df where vfdb or card - stricter threshold due to Enault et al
     # https://www.nature.com/articles/ismej201690
     # defaults to 1e-10
+    # evalue is already float64 from the read, so no per-filter astype copy;
+    # one isin replaces the four phrog equality masks
+    is_card_vfdb = foldseek_df["phrog"].isin(("vfdb", "card"))
     foldseek_df = foldseek_df[
-        ((foldseek_df["phrog"] == "vfdb") | (foldseek_df["phrog"] == "card"))
-        & (foldseek_df["evalue"].astype(float) < float(card_vfdb_evalue))
-        | ((foldseek_df["phrog"] != "vfdb") & (foldseek_df["phrog"] != "card"))
+        ~is_card_vfdb | (foldseek_df["evalue"] < float(card_vfdb_evalue))
     ]
 
-    def custom_nsmallest(group):
-        # where all the
-        if all(group["product"] == "hypothetical protein"):
-            min_row_index = group["evalue"].idxmin()
-            # Get the entire row
-            return group.loc[min_row_index]
-        else:
-            group = group[group["product"] != "hypothetical protein"]
-            min_row_index = group["evalue"].idxmin()
-            # Get the entire row
-            return group.loc[min_row_index]
+    # pick each query's best hit with a stable sort + drop_duplicates rather
+    # than a Python function applied per group: prefer hits whose product is
+    # not hypothetical, then the lowest evalue, with ties broken by original
+    # row order (matching the idxmin behaviour of the old per-group code)
+    foldseek_df["_hypothetical"] = (
+        foldseek_df["product"] == "hypothetical protein"
+    ).astype("int8")
 
     topfunction_df = (
-        foldseek_df.groupby("query", group_keys=True)
-        .apply(custom_nsmallest)
+        foldseek_df.sort_values(["query", "_hypothetical", "evalue"], kind="stable")
+        .drop_duplicates("query", keep="first")
+        .drop(columns=["_hypothetical"])
         .reset_index(drop=True)
     )
+    foldseek_df = foldseek_df.drop(columns=["_hypothetical"])
 
     topfunction_dict = dict(zip(topfunction_df["query"], topfunction_df["function"]))
 
     # Remove the original 'query' column
     topfunction_df = topfunction_df.drop(columns=["query"])
 
-    # scientific notation to 3dp
-    topfunction_df["evalue"] = topfunction_df["evalue"].apply(
-        lambda x: "{:.3e}".format(float(x))
-    )
-
-    def weighted_function(group: pd.DataFrame) -> pd.DataFrame:
-        """
-        Calculate weighted function proportion based on bitscores.
-
-        Args:
-            group (pd.DataFrame): DataFrame containing foldseek search results for a group.
-
-        Returns:
-            pd.DataFrame: DataFrame containing weighted function proportion.
-        """
+    # scientific notation to 3dp - a list comprehension over the raw array
+    # skips the per-row call and index overhead of Series.apply
+    topfunction_df["evalue"] = [
+        f"{evalue:.3e}" for evalue in topfunction_df["evalue"].to_numpy()
+    ]
 
-        # normalise counts by total bitscore
-        weighted_counts_normalised = {}
-        # total_bitscore = group['bitscore'].sum()
-        bitscore_by_function = group.groupby("function")["bitscore"].sum().to_dict()
+    # weighted per-function bitscore proportions, vectorised over one
+    # (query x function) pivot of summed bitscores rather than building a
+    # one-row DataFrame per query in Python
+    # observed=True keeps the pivot to the function categories actually
+    # present, rather than materialising a column per declared category
+    bitscore_pivot = foldseek_df.pivot_table(
+        index="query",
+        columns="function",
+        values="bitscore",
+        aggfunc="sum",
+        fill_value=0.0,
+        observed=True,
+    )
+    # alphabetical column order matches the old per-group dict insertion
+    # order, so argmax tie-breaking is unchanged
+    bitscore_pivot = bitscore_pivot.reindex(sorted(bitscore_pivot.columns), axis=1)
+
+    # everything except unknown function
+    # get total bitscore of the hits with function
+    functional_pivot = bitscore_pivot.drop(
+        columns=["unknown function"], errors="ignore"
+    )
+    total_functional_bitscore = functional_pivot.sum(axis=1)
 
-        total_functional_bitscore = group[group["function"] != "unknown function"][
-            "bitscore"
-        ].sum()
+    # normalise counts by total bitscore (NaN where a query only has
+    # unknown-function hits, filled with 0 below)
+    normalised = (
+        functional_pivot.div(
+            total_functional_bitscore.where(total_functional_bitscore != 0), axis=0
+        )
+        .round(3)
+        .fillna(0)
+    )
 
-        if total_functional_bitscore == 0:
-            top_bitscore_function = "unknown function"
-            top_bitscore_perc = 0
+    has_function = (total_functional_bitscore != 0).to_numpy()
+    if len(normalised.columns) > 0:
+        proportion_values = normalised.to_numpy()
+        top_idx = proportion_values.argmax(axis=1)
+        top_bitscore_function = np.where(
+            has_function,
+            np.asarray(normalised.columns, dtype=object)[top_idx],
+            "unknown function",
+        )
+        top_bitscore_perc = np.where(
+            has_function,
+            proportion_values[np.arange(len(proportion_values)), top_idx],
+            0,
+        )
+    else:
+        top_bitscore_function = np.full(len(bitscore_pivot), "unknown function")
+        top_bitscore_perc = np.zeros(len(bitscore_pivot))
 
-        # everything except unknown function
-        # get total bitscore of the hits with function
-        else:
-            # get the weighted bitscore
-            for key, value in bitscore_by_function.items():
-                if key != "unknown function":
-                    weighted_counts_normalised[key] = round(
-                        value / total_functional_bitscore, 3
-                    )
-
-            top_bitscore_function = max(
-                weighted_counts_normalised, key=weighted_counts_normalised.get
-            )
-            top_bitscore_perc = max(weighted_counts_normalised.values())
-
-        d = {
-            "function_with_highest_bitscore_proportion": [top_bitscore_function],
-            "top_bitscore_proportion_not_unknown": [top_bitscore_perc],
-            "head_and_packaging_bitscore_proportion": [
-                weighted_counts_normalised.get("head and packaging", 0)
-            ],
-            "integration_and_excision_bitscore_proportion": [
-                weighted_counts_normalised.get("integration and excision", 0)
-            ],
-            "tail_bitscore_proportion": [weighted_counts_normalised.get("tail", 0)],
-            "moron_auxiliary_metabolic_gene_and_host_takeover_bitscore_proportion": [
-                weighted_counts_normalised.get(
-                    "moron, auxiliary metabolic gene and host takeover", 0
-                )
-            ],
-            "DNA_RNA_and_nucleotide_metabolism_bitscore_proportion": [
-                weighted_counts_normalised.get("DNA, RNA and nucleotide metabolism", 0)
-            ],
-            "connector_bitscore_proportion": [
-                weighted_counts_normalised.get("connector", 0)
-            ],
-            "transcription_regulation_bitscore_proportion": [
-                weighted_counts_normalised.get("transcription regulation", 0)
-            ],
-            "lysis_bitscore_proportion": [weighted_counts_normalised.get("lysis", 0)],
-            "other_bitscore_proportion": [weighted_counts_normalised.get("other", 0)],
-            "unknown_function_bitscore_proportion": [
-                weighted_counts_normalised.get("unknown function", 0)
-            ],
+    weighted_bitscore_df = pd.DataFrame(
+        {
+            "query": bitscore_pivot.index.to_numpy(),
+            "function_with_highest_bitscore_proportion": top_bitscore_function,
+            "top_bitscore_proportion_not_unknown": top_bitscore_perc,
         }
-
-        weighted_bitscore_df = pd.DataFrame(data=d)
-
-        return weighted_bitscore_df
-
-    weighted_bitscore_df = foldseek_df.groupby("query", group_keys=True).apply(
-        weighted_function
     )
 
-    weighted_bitscore_df.reset_index(inplace=True)
-    weighted_bitscore_df["query"] = weighted_bitscore_df["query"].str.replace(
-        ".pdb", ""
+    proportion_columns = {
+        "head and packaging": "head_and_packaging_bitscore_proportion",
+        "integration and excision": "integration_and_excision_bitscore_proportion",
+        "tail": "tail_bitscore_proportion",
+        "moron, auxiliary metabolic gene and host takeover": "moron_auxiliary_metabolic_gene_and_host_takeover_bitscore_proportion",
+        "DNA, RNA and nucleotide metabolism": "DNA_RNA_and_nucleotide_metabolism_bitscore_proportion",
+        "connector": "connector_bitscore_proportion",
+        "transcription regulation": "transcription_regulation_bitscore_proportion",
+        "lysis": "lysis_bitscore_proportion",
+        "other": "other_bitscore_proportion",
+        "unknown function": "unknown_function_bitscore_proportion",
+    }
+    for category, column in proportion_columns.items():
+        # the unknown function proportion is never part of the normalised
+        # table, so it stays 0 as before
+        if category in normalised.columns:
+            weighted_bitscore_df[column] = normalised[category].to_numpy()
+        else:
+            weighted_bitscore_df[column] = 0
+
+    weighted_bitscore_df["query"] = weighted_bitscore_df["query"].str.removesuffix(
+        ".pdb"
     )
-    weighted_bitscore_df = weighted_bitscore_df.drop(columns=["level_1"])
 
     return topfunction_df, weighted_bitscore_df
 
@@ -243,25 +318,21 @@ def calculate_topfunctions_results(
         Union[Dict[str, Dict[str, dict]], pd.DataFrame]: Updated CDS dictionary and/or filtered top hits DataFrame.
     """
 
-    # dictionary to hold the results
-    result_dict = {}
-
-    # so I can match with the df row below
-    cds_record_dict = {}
+    # dictionary to hold the results - only CDS with a foldseek hit are
+    # populated below, everything else is simply absent and skipped
+    result_dict = {record_id: {} for record_id in cds_dict}
 
-    for record_id, cds_entries in cds_dict.items():
-        result_dict[record_id] = {}
-        for cds_id, cds_info in cds_entries.items():
-            result_dict[record_id][cds_id] = {}
-            cds_record_dict[cds_id] = record_id
-
-    # Get record_id for every cds_id and merge into the df
+    # Get record_id for every cds_id - a dict-backed map is one hash lookup
+    # per row, with none of the merge machinery or intermediate DataFrame.
+    # only the pdb path needs the cds -> contig mapping at all
     if pdb is True:
-        cds_record_df = pd.DataFrame(
-            list(cds_record_dict.items()), columns=["cds_id", "contig_id"]
-        )
-        filtered_tophits_df = pd.merge(
-            filtered_tophits_df, cds_record_df, on="cds_id", how="left"
+        cds_record_dict = {
+            cds_id: record_id
+            for record_id, cds_entries in cds_dict.items()
+            for cds_id in cds_entries
+        }
+        filtered_tophits_df["contig_id"] = filtered_tophits_df["cds_id"].map(
+            cds_record_dict
         )
 
     if proteins_flag is True:
@@ -278,46 +349,25 @@ def calculate_topfunctions_results(
         ]
         filtered_tophits_df = filtered_tophits_df[column_order]
 
-    # loop over all the foldseek tophits and add to the dict
-    for _, row in filtered_tophits_df.iterrows():
-        if proteins_flag is False:
-            record_id = row["contig_id"]
-        else:
-            record_id = "proteins"
-
-        cds_id = row["cds_id"]
-        values_dict = {
-            "phrog": row["phrog"],
-            "product": row["product"],
-            "function": row["function"],
-            "tophit_protein": row["tophit_protein"],
-            "bitscore": row["bitscore"],
-            "fident": row["fident"],
-            "evalue": row["evalue"],
-            "qStart": row["qStart"],
-            "qEnd": row["qEnd"],
-            "qLen": row["qLen"],
-            "tStart": row["tStart"],
-            "tEnd": row["tEnd"],
-            "tLen": row["tLen"],
-        }
-        result_dict[record_id][cds_id] = values_dict
-
-    # copy initial cds_dict
-    updated_cds_dict = copy.deepcopy(cds_dict)
-
-    phrog_function_mapping = {
-        "unknown function": "unknown function",
-        "transcription regulation": "transcription regulation",
-        "tail": "tail",
-        "other": "other",
-        "moron, auxiliary metabolic gene and host takeover": "moron, auxiliary metabolic gene and host takeover",
-        "lysis": "lysis",
-        "integration and excision": "integration and excision",
-        "head and packaging": "head and packaging",
-        "DNA, RNA and nucleotide metabolism": "DNA, RNA and nucleotide metabolism",
-        "connector": "connector",
-    }
+    # add all the foldseek tophits to the dict - itertuples hands back plain
+    # tuples with no per-row Series or dict-key rebuilding, and each values
+    # dict is assembled with one zip over the shared column tuple
+    if proteins_flag is False:
+        rows = filtered_tophits_df[
+            ["contig_id", "cds_id", *TOPHIT_COLUMNS]
+        ].itertuples(index=False, name=None)
+        for row in rows:
+            result_dict[row[0]][row[1]] = dict(zip(TOPHIT_COLUMNS, row[2:]))
+    else:
+        rows = filtered_tophits_df[["cds_id", *TOPHIT_COLUMNS]].itertuples(
+            index=False, name=None
+        )
+        for row in rows:
+            result_dict["proteins"][row[0]] = dict(zip(TOPHIT_COLUMNS, row[1:]))
+
+    # update the features in place - a deepcopy of the BioPython SeqFeature
+    # tree is very slow and nothing downstream needs the pre-update state
+    updated_cds_dict = cds_dict
 
     # iterates over the records
     for record_id, record in updated_cds_dict.items():
@@ -329,73 +379,32 @@ def calculate_topfunctions_results(
                 cds_feature.qualifiers["phrog"] = ["No_PHROG"]
                 cds_feature.qualifiers["product"] = ["hypothetical protein"]
 
-            # original pharokka phrog categories
-            pharokka_phrog_function_category = phrog_function_mapping.get(
-                cds_feature.qualifiers["function"][0], None
-            )
-
-            # if the result_dict is not empty
-            # this is a foldseek hit
-            if result_dict[record_id][cds_id] != {}:
-                # get the foldseek function
-                # function will be None if there is no foldseek hit - shouldn't happen here but error handling
-                foldseek_phrog = result_dict[record_id][cds_id].get("phrog", None)
-
-                # same phrog as pharokka do nothing
-                # different phrog as pharokka
-                if foldseek_phrog != cds_feature.qualifiers["phrog"][0]:
-                    # where there was no phrog in pharokka
-                    if cds_feature.qualifiers["phrog"][0] == "No_PHROG":
-                        updated_cds_dict[record_id][cds_id].qualifiers["phrog"][
-                            0
-                        ] = result_dict[record_id][cds_id]["phrog"]
-                        updated_cds_dict[record_id][cds_id].qualifiers["product"][
-                            0
-                        ] = result_dict[record_id][cds_id]["product"]
-                        updated_cds_dict[record_id][cds_id].qualifiers["function"][
-                            0
-                        ] = result_dict[record_id][cds_id]["function"]
-
-                    # pharokka has a phrog
-                    else:
-                        # if the foldseek result is not unknown function then update
-                        if (
-                            result_dict[record_id][cds_id]["function"]
-                            != "unknown function"
-                        ):
-                            # update
-                            updated_cds_dict[record_id][cds_id].qualifiers["phrog"][
-                                0
-                            ] = result_dict[record_id][cds_id]["phrog"]
-                            updated_cds_dict[record_id][cds_id].qualifiers["product"][
-                                0
-                            ] = result_dict[record_id][cds_id]["product"]
-                            updated_cds_dict[record_id][cds_id].qualifiers["function"][
-                                0
-                            ] = result_dict[record_id][cds_id]["function"]
-                        # if foldseek result has unknown function
-                        else:
-                            # if pharokka has known function
-                            # keep the pharokka phrogs - aka do nothing
-                            #
-                            # if the pharokka has unknown function, update with foldseek hit
-                            if (
-                                cds_feature.qualifiers["function"][0]
-                                == "unknown function"
-                            ):
-                                updated_cds_dict[record_id][cds_id].qualifiers["phrog"][
-                                    0
-                                ] = result_dict[record_id][cds_id]["phrog"]
-                                updated_cds_dict[record_id][cds_id].qualifiers[
-                                    "product"
-                                ][0] = result_dict[record_id][cds_id]["product"]
-                                updated_cds_dict[record_id][cds_id].qualifiers[
-                                    "function"
-                                ][0] = result_dict[record_id][cds_id]["function"]
-
-            # no foldseek hits - empty dict
-            # will be empty in results dict
+            # no foldseek hit - empty in the results dict
             # therefore just leave whatever pharokka has
+            foldseek_result = result_dict[record_id].get(cds_id)
+            if not foldseek_result:
+                continue
+
+            quals = cds_feature.qualifiers
+            pharokka_phrog = quals["phrog"][0]
+            # function will be None if there is no foldseek hit - shouldn't happen here but error handling
+            foldseek_phrog = foldseek_result.get("phrog", None)
+            foldseek_function = foldseek_result["function"]
+
+            # take the foldseek hit when it found a different phrog AND
+            # either pharokka had no phrog at all, foldseek assigned a real
+            # function, or pharokka's own function was unknown anyway -
+            # i.e. a known pharokka function is only ever displaced by a
+            # known foldseek function (the same outcomes as the old
+            # four-level branch ladder, in one condition)
+            if foldseek_phrog != pharokka_phrog and (
+                pharokka_phrog == "No_PHROG"
+                or foldseek_function != "unknown function"
+                or quals["function"][0] == "unknown function"
+            ):
+                quals["phrog"][0] = foldseek_result["phrog"]
+                quals["product"][0] = foldseek_result["product"]
+                quals["function"][0] = foldseek_function
 
     return updated_cds_dict, filtered_tophits_df
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
@@ -13,7 +14,11 @@ from phold.features.create_foldseek_db import (
     generate_foldseek_db_from_aa_3di,
     generate_foldseek_db_from_pdbs,
 )
-from phold.features.run_foldseek import create_result_tsv, run_foldseek_search
+from phold.features.run_foldseek import (
+    create_result_tsv,
+    prewarm_db,
+    run_foldseek_search,
+)
 from phold.features.split_3Di import split_3di_fasta_by_prob
 from phold.io.handle_genbank import write_genbank
 from phold.io.sub_db_outputs import create_sub_db_outputs
@@ -182,6 +187,18 @@ def subcommand_compare(
     foldseek_query_db_path: Path = Path(output) / "foldseek_db"
     foldseek_query_db_path.mkdir(parents=True, exist_ok=True)
 
+    # warm the target database(s) in the background while the query database
+    # is being created, so the search does not start on a cold page cache
+    if split is True:
+        target_db_names = ["all_phold_structures", "all_phold_prostt5"]
+    else:
+        target_db_names = ["all_phold_structures"]
+
+    prewarm_executor = ThreadPoolExecutor(max_workers=1)
+    for target_db_name in target_db_names:
+        prewarm_executor.submit(prewarm_db, Path(database) / target_db_name)
+    prewarm_executor.shutdown(wait=False)
+
     if pdb is True:
         logger.info("Creating a foldseek query database from structures.")
 
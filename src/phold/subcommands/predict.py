@@ -1,12 +1,47 @@
 #!/usr/bin/env python3
 
+import hashlib
+import json
+import sqlite3
 from pathlib import Path
 
+from Bio import SeqIO
 from loguru import logger
 
 from phold.features.predict_3Di import get_embeddings
 from phold.features.predict_3Di_finetune import get_embeddings_finetune
 
+CACHE_COLUMNS = ["h", "seq3di", "mean_prob", "probs"]
+
+
+def open_embedding_cache(cache_db: Path) -> sqlite3.Connection:
+    """
+    Open (creating if necessary) the on-disk 3Di prediction cache.
+
+    The cache is content-addressed: SHA1 of the AA translation plus the model
+    precision -> the 3Di string, the mean ProstT5 probability and the rounded
+    per-residue probabilities (as a JSON list, NULL when predicted with
+    --omit_probs).
+
+    Args:
+        cache_db (Path): Path to the sqlite cache file.
+
+    Returns:
+        sqlite3.Connection: Connection to the cache database.
+    """
+    conn = sqlite3.connect(cache_db)
+    # caches from older phold versions only stored the 3Di string - they are
+    # disposable, so just recreate them with the full schema
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(embed3di)")]
+    if columns and columns != CACHE_COLUMNS:
+        conn.execute("DROP TABLE embed3di")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embed3di"
+        "(h TEXT PRIMARY KEY, seq3di TEXT, mean_prob REAL, probs TEXT)"
+    )
+    conn.commit()
+    return conn
+
 
 def subcommand_predict(
     gb_dict: dict,
@@ -49,13 +84,21 @@ def subcommand_predict(
 
     fasta_aa: Path = Path(output) / f"{prefix}_aa.fasta"
 
+    # makes the nested dictionary {contig_id:{cds_id: cds_feature}} and
+    # collects the AA FASTA entries in the same pass, flushed with a single
+    # buffered writelines rather than a write call per CDS
+    fasta_lines = []
+    append_line = fasta_lines.append
+
     # if proteins, already done and passed as gb_dict
     if proteins_flag is True:
         cds_dict = gb_dict
+        for contig_id, aa_contig_dict in cds_dict.items():
+            for seq_id, cds_feature in aa_contig_dict.items():
+                append_line(f">{seq_id}\n{cds_feature.qualifiers['translation']}\n")
     else:
         # Create a nested dictionary to store CDS features by contig ID
         cds_dict = {}
-        # makes the nested dictionary {contig_id:{cds_id: cds_feature}}
         for record_id, record in gb_dict.items():
             cds_dict[record_id] = {}
             for cds_feature in record.features:
@@ -65,25 +108,16 @@ def subcommand_predict(
                         cds_feature.qualifiers["translation"] = cds_feature.qualifiers[
                             "translation"
                         ][0]
-                        cds_dict[record_id][
-                            cds_feature.qualifiers["ID"][0]
-                        ] = cds_feature
+                        cds_id = cds_feature.qualifiers["ID"][0]
                     else:
-                        cds_dict[record_id][cds_feature.qualifiers["ID"]] = cds_feature
+                        cds_id = cds_feature.qualifiers["ID"]
+                    cds_dict[record_id][cds_id] = cds_feature
+                    append_line(
+                        f">{record_id}:{cds_id}\n{cds_feature.qualifiers['translation']}\n"
+                    )
 
-    ########
-    ## write the AA CDS to file
-    ######
-    with open(fasta_aa, "w+") as out_f:
-        for contig_id, rest in cds_dict.items():
-            aa_contig_dict = cds_dict[contig_id]
-
-            for seq_id, cds_feature in aa_contig_dict.items():
-                if proteins_flag is True:
-                    out_f.write(f">{seq_id}\n")
-                else:
-                    out_f.write(f">{contig_id}:{seq_id}\n")
-                out_f.write(f"{cds_feature.qualifiers['translation']}\n")
+    with open(fasta_aa, "w", buffering=1 << 20) as out_f:
+        out_f.writelines(fasta_lines)
 
     ############
     # prostt5
@@ -113,20 +147,159 @@ def subcommand_predict(
         )
 
     else:
-        prediction_success = get_embeddings(
-            cds_dict,
-            output,
-            prefix,
-            model_dir,
-            model_name,
-            fasta_3di,
-            half_precision=half_precision,
-            max_residues=5000,
-            max_seq_len=1000,
-            max_batch=batch_size,
-            cpu=cpu,
-            output_probs=output_probs,
-            proteins_flag=proteins_flag,
+        # check the content-addressed 3Di cache before batching into ProstT5
+        # cache hits skip the (expensive) forward pass entirely. The cache
+        # lives next to the model rather than in the output directory, which
+        # instantiate_dirs wipes (or refuses) on every run - reruns and
+        # overlapping inputs hit the same cache file
+        cache_db: Path = Path(model_dir) / ".phold_3di_cache.db"
+        try:
+            cache_conn = open_embedding_cache(cache_db)
+        except (OSError, sqlite3.Error):
+            logger.warning(
+                f"Could not open the 3Di prediction cache {cache_db}. Predictions will not be cached"
+            )
+            cache_conn = None
+
+        # half and full precision predictions differ, so they must not share
+        # cache entries
+        precision = "half" if half_precision else "full"
+
+        # the probability files are written by get_embeddings for the misses
+        # and extended below for the cache hits
+        mean_probs_out_path: Path = (
+            Path(output) / f"{prefix}_prostT5_3di_mean_probabilities.csv"
+        )
+        all_probs_out_path: Path = (
+            Path(output) / f"{prefix}_prostT5_3di_all_probabilities.json"
         )
 
+        # {contig_id: {cds_id: sha1 key}}
+        hash_dict = {}
+        # cache hits {contig_id: {cds_id: (3di string, mean prob, probs JSON)}}
+        cached_3di = {}
+
+        if cache_conn is None:
+            # no usable cache - everything is a miss
+            miss_dict = cds_dict
+        else:
+            # cache misses - nested dict in the same format as cds_dict
+            miss_dict = {}
+            for contig_id, aa_contig_dict in cds_dict.items():
+                hash_dict[contig_id] = {}
+                cached_3di[contig_id] = {}
+                miss_dict[contig_id] = {}
+                for seq_id, cds_feature in aa_contig_dict.items():
+                    translation = cds_feature.qualifiers["translation"]
+                    seq_hash = hashlib.sha1(
+                        f"{translation}\n{precision}".encode()
+                    ).hexdigest()
+                    hash_dict[contig_id][seq_id] = seq_hash
+                    row = cache_conn.execute(
+                        "SELECT seq3di, mean_prob, probs FROM embed3di WHERE h = ?",
+                        (seq_hash,),
+                    ).fetchone()
+                    # an entry cached by an --omit_probs run has no
+                    # probabilities, so it cannot serve a run that needs them
+                    if row is not None and not (output_probs and row[2] is None):
+                        cached_3di[contig_id][seq_id] = row
+                    else:
+                        miss_dict[contig_id][seq_id] = cds_feature
+
+        hit_count = sum(len(hits) for hits in cached_3di.values())
+        miss_count = sum(len(misses) for misses in miss_dict.values())
+
+        if miss_count > 0:
+            prediction_success = get_embeddings(
+                miss_dict,
+                output,
+                prefix,
+                model_dir,
+                model_name,
+                fasta_3di,
+                half_precision=half_precision,
+                max_residues=5000,
+                max_seq_len=1000,
+                max_batch=batch_size,
+                cpu=cpu,
+                output_probs=output_probs,
+                proteins_flag=proteins_flag,
+            )
+
+            # save the fresh predictions to the cache in a single transaction
+            if cache_conn is not None:
+                # the probability files are keyed by the CDS id alone
+                mean_probs = {}
+                all_probs = {}
+                if output_probs:
+                    with open(mean_probs_out_path) as mean_f:
+                        for line in mean_f:
+                            seq_id, mean_prob = line.rstrip("\n").rsplit(",", 1)
+                            mean_probs[seq_id] = float(mean_prob)
+                    with open(all_probs_out_path) as all_f:
+                        for line in all_f:
+                            entry = json.loads(line)
+                            all_probs[entry["seq_id"]] = json.dumps(
+                                entry["probability"]
+                            )
+
+                new_rows = []
+                for record in SeqIO.parse(fasta_3di, "fasta"):
+                    if proteins_flag is True:
+                        contig_id, seq_id = "proteins", record.id
+                    else:
+                        contig_id, seq_id = record.id.split(":", 1)
+                    seq_hash = hash_dict.get(contig_id, {}).get(seq_id)
+                    if seq_hash is not None:
+                        new_rows.append(
+                            (
+                                seq_hash,
+                                str(record.seq),
+                                mean_probs.get(seq_id),
+                                all_probs.get(seq_id),
+                            )
+                        )
+                with cache_conn:
+                    cache_conn.executemany(
+                        "INSERT OR REPLACE INTO embed3di VALUES (?, ?, ?, ?)",
+                        new_rows,
+                    )
+        else:
+            logger.info("All 3Di predictions were found in the cache. Skipping ProstT5")
+            prediction_success = True
+
+        # write the cache hits to the 3Di FASTA and the probability files
+        if hit_count > 0:
+            logger.info(
+                f"{hit_count} 3Di predictions were retrieved from the cache {cache_db}"
+            )
+            mode = "a" if miss_count > 0 else "w"
+            with open(fasta_3di, mode) as out_f:
+                for contig_id, hits in cached_3di.items():
+                    for seq_id, (seq3di, _, _) in hits.items():
+                        if proteins_flag is True:
+                            out_f.write(f">{seq_id}\n{seq3di}\n")
+                        else:
+                            out_f.write(f">{contig_id}:{seq_id}\n{seq3di}\n")
+
+            if output_probs:
+                with open(mean_probs_out_path, mode) as mean_f, open(
+                    all_probs_out_path, mode
+                ) as all_f:
+                    for hits in cached_3di.values():
+                        for seq_id, (_, mean_prob, probs) in hits.items():
+                            mean_f.write(f"{seq_id},{mean_prob}\n")
+                            all_f.write(
+                                json.dumps(
+                                    {
+                                        "seq_id": seq_id,
+                                        "probability": json.loads(probs),
+                                    }
+                                )
+                                + "\n"
+                            )
+
+        if cache_conn is not None:
+            cache_conn.close()
+
     return prediction_success
@@ -1,3 +1,4 @@
+import functools
 import os
 import shutil
 import sys
@@ -20,6 +21,9 @@ def phold_base(rel_path):
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), rel_path)
 
 
+# cached - click evaluates this for every subcommand's --version option at
+# import time, and the VERSION file does not change under a running process
+@functools.lru_cache(maxsize=1)
 def get_version():
     with open(phold_base("VERSION"), "r") as f:
         version = f.readline()
@@ -23,7 +23,7 @@ def validate_input(input: Path, threads: int) -> Dict[str, Union[bool, Dict]]:
 
     # validates input
     fasta_flag = False
-    gb_dict = get_genbank(input)
+    gb_dict = get_genbank(input, threads)
     if not gb_dict:
         logger.warning(f"{input} was not a Genbank format file")
         logger.warning(